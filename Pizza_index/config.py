@@ -1,7 +1,14 @@
 import os
 
-# give time to download map tiles
+# give time to download map tiles, at most this many seconds
 SLEEP_SEC = 30.0
+# once a place has a few load times in LOAD_TIMES_PATH, its timeout is
+# the p95 of them times READY_TIMEOUT_MARGIN, but at least READY_TIMEOUT_MIN
+READY_TIMEOUT_MIN = 5.0
+READY_TIMEOUT_MARGIN = 1.5
+LOAD_TIMES_PATH = 'logs' + os.sep + 'load_times.json'
+# a place panel without popularity bars after this many seconds has no popular times
+READY_NO_DATA_GRACE = 3.0
 
 # csv output delimiter
 DELIM = ','
@@ -11,9 +18,51 @@ HEADER_COLUMNS = ('place', 'url', 'scrape_time', 'day_of_week', 'hour_of_day', '
 CHROME_BINARY_LOCATION = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
 CHROMEDRIVER_BINARY_LOCATION = '/usr/local/bin/chromedriver'
 
-# keep an cache of the source htmls, with a timestamp in the filename
-# if so, they should be cleaned out once in a while, since they are 1MB each
+# 'light' blocks images, map tiles, fonts and media, turns off the gpu and
+# extensions, and caps the javascript heap of the page; 'default' is plain chrome
+BROWSER_PROFILE = 'light'
+BROWSER_MAX_HEAP_MB = 512
+BLOCKED_URLS = [
+	'*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.ico',
+	'*.woff', '*.woff2', '*.ttf', '*.otf',
+	'*.mp4', '*.webm', '*.mp3',
+	'*/maps/vt*', '*/kh?v=*', '*.googleusercontent.com/*', '*fonts.googleapis.com/*',
+]
+
+# keep the source htmls in gzipped archives, one per day, with an index of
+# (place, run time) -> offset so single pages can be read back
 SAVE_HTML = True
+HTML_ARCHIVE_DIR = 'html' + os.sep + 'archive'
+# whole days are deleted, oldest first, to stay under this size
+HTML_ARCHIVE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# parsed data is cached by the hash of the page, so identical pages are parsed once
+# the cache is pruned (least recently used first) to stay under this size
+HTML_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# how to find the popularity bars in a page: 'fast' scans for them directly,
+# 'bs4' parses the whole page with beautifulsoup4 (slower, kept as a fallback)
+PARSER_BACKEND = 'fast'
+
+# short urls (goo.gl) are expanded by this many threads at once, and the
+# expanded urls are reused from URL_CACHE_PATH for URL_CACHE_TTL_SEC
+EXPAND_WORKERS = 16
+URL_CACHE_PATH = 'logs' + os.sep + 'url_cache.json'
+URL_CACHE_TTL_SEC = 30 * 24 * 3600
+
+# each run is journaled here, url by url, so a run that died is resumed where
+# it stopped. failed urls are tried RETRY_MAX_ATTEMPTS times, waiting
+# RETRY_BACKOFF_SEC before the second try, then twice as long, ...
+# only a run started less than RUN_INTERVAL_SEC ago is resumed, an older one
+# is closed so the new run collects the current hour. set it to how often the
+# scraper is run, e.g. from cron
+JOURNAL_PATH = 'logs' + os.sep + 'journal.sqlite'
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SEC = 30
+RUN_INTERVAL_SEC = 3600
+
+# URLs read and expanded ahead of the scraping, at most
+URL_QUEUE_SIZE = 100
 
 # put your url or path here to a csv where the first column is a google maps url
 # google sheets - export as csv https://stackoverflow.com/a/33727897/2327328
@@ -1,26 +1,120 @@
 #!/usr/bin/env python
 
 '''
-Convert all CSVs to one big db or csv
+Load all CSVs into one big sqlite db, incrementally
+
+Files that were already loaded are listed in a manifest table and skipped,
+so this is cheap to run from cron after every scrape.
 '''
 
 import os
+import csv
 import glob
-import pandas as pd
+import time
 import sqlite3
+from datetime import datetime
+
+DB_PATH = 'data' + os.sep + 'all.sqlite'
+TABLE = 'all'
+MANIFEST = '_ingested_files'
+
+# rows inserted per executemany call
+CHUNK_ROWS = 10000
+
+# files modified more recently than this may still be being written
+MIN_AGE_SEC = 5
+
+COLUMNS = (
+	('place', 'TEXT'),
+	('url', 'TEXT'),
+	('scrape_time', 'TEXT'),
+	('day_of_week', 'TEXT'),
+	('hour_of_day', 'INTEGER'),
+	('popularity_percent_normal', 'INTEGER'),
+	('popularity_percent_current', 'INTEGER'),
+)
+
+def setup(conn):
+	has_table = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE,)).fetchone()
+	has_manifest = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (MANIFEST,)).fetchone()
+	if has_table and not has_manifest:
+		# made by the old full-replace version, we don't know which files are in it
+		print('rebuilding', DB_PATH, 'from scratch')
+		conn.execute('DROP TABLE "%s"' % TABLE)
+
+	conn.execute('CREATE TABLE IF NOT EXISTS "%s" (%s)' % (TABLE, ', '.join('%s %s' % c for c in COLUMNS)))
+	conn.execute('''CREATE TABLE IF NOT EXISTS %s (
+		file TEXT PRIMARY KEY,
+		size INTEGER,
+		rows INTEGER,
+		ingested_at TEXT
+	)''' % MANIFEST)
+	for column in ('place', 'day_of_week', 'hour_of_day'):
+		conn.execute('CREATE INDEX IF NOT EXISTS "idx_%s_%s" ON "%s" (%s)' % (TABLE, column, TABLE, column))
+	conn.commit()
+
+def chunks(reader, header):
+	# yield lists of rows, in table column order, with empty cells as NULL
+	positions = [header.index(name) if name in header else None for name, _ in COLUMNS]
+	chunk = []
+	for row in reader:
+		if not row:
+			continue
+		chunk.append([(row[i] or None) if i is not None and i < len(row) else None for i in positions])
+		if len(chunk) >= CHUNK_ROWS:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+def ingest(conn, file_name):
+	# load one file and record it in the manifest, all in one transaction
+	insert = 'INSERT INTO "%s" VALUES (%s)' % (TABLE, ', '.join('?' * len(COLUMNS)))
+	rows = 0
+
+	conn.execute('BEGIN IMMEDIATE')
+	try:
+		# checked again inside the lock, in case another run got here first
+		if conn.execute('SELECT 1 FROM %s WHERE file = ?' % MANIFEST, (file_name,)).fetchone():
+			conn.rollback()
+			return 0
+
+		with open(file_name, 'r', newline='') as f:
+			reader = csv.reader(f)
+			header = next(reader, None)
+			if header is not None:
+				for chunk in chunks(reader, header):
+					conn.executemany(insert, chunk)
+					rows += len(chunk)
+
+		conn.execute(
+			'INSERT INTO %s VALUES (?, ?, ?, ?)' % MANIFEST,
+			(file_name, os.path.getsize(file_name), rows, datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+		)
+		conn.commit()
+	except:
+		conn.rollback()
+		raise
+	return rows
 
 def main():
-	# get all matching csv files
-	all_files = glob.glob('data' + os.sep + '*.csv')
-	
-	# it's not big data
-	# and they should have all the same data model
-	df = pd.concat((pd.read_csv(f) for f in all_files))
+	# isolation_level=None, so transactions are only the ones ingest() starts
+	conn = sqlite3.connect(DB_PATH, timeout=60, isolation_level=None)
+	setup(conn)
+
+	done = set(f for (f,) in conn.execute('SELECT file FROM %s' % MANIFEST))
+	now = time.time()
 
-	conn = sqlite3.connect('data' + os.sep + 'all.sqlite')
-	df.to_sql(name='all', con=conn, if_exists='replace', index=False)
+	files = 0
+	rows = 0
+	for file_name in sorted(glob.glob('data' + os.sep + '*.csv')):
+		if file_name in done or now - os.path.getmtime(file_name) < MIN_AGE_SEC:
+			continue
+		rows += ingest(conn, file_name)
+		files += 1
 
 	conn.close()
+	print('loaded', rows, 'rows from', files, 'new files into', DB_PATH)
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+'''
+Compressed, seekable daily archives of scraped html pages
+
+Usage:
+	python html_archive.py list DAY
+	python html_archive.py extract DAY PLACE TIMESTAMP
+'''
+
+import os
+import sys
+import gzip
+
+class HtmlArchive:
+	'''
+	Pages are appended to one archive per day, <day>.html.gz, each page as its own
+	gzip member. Concatenated gzip members are still a valid gzip file, so the
+	whole archive can be read with zcat, while a single page can be read back by
+	seeking to its member and decompressing only that.
+
+	<day>.idx has one tab separated line per page: place, timestamp, offset, length.
+	'''
+
+	def __init__(self, directory):
+		self.directory = directory
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+	def _paths(self, day):
+		base = os.path.join(self.directory, day)
+		return base + '.html.gz', base + '.idx'
+
+	def append(self, place, timestamp, html):
+		# timestamps look like 20200318_163629, the day is the part before the _
+		day = timestamp.split('_')[0]
+		archive_path, index_path = self._paths(day)
+
+		member = gzip.compress(html.encode('utf-8'))
+		with open(archive_path, 'ab') as f:
+			offset = f.tell()
+			f.write(member)
+
+		# the index line is written last, so a page is only listed once it is complete
+		with open(index_path, 'a') as f:
+			f.write('\t'.join((place, timestamp, str(offset), str(len(member)))) + '\n')
+
+	def days(self):
+		return sorted(f[:-len('.idx')] for f in os.listdir(self.directory) if f.endswith('.idx'))
+
+	def index(self, day):
+		# returns [(place, timestamp, offset, length), ...] in the order the pages were written
+		_, index_path = self._paths(day)
+		entries = []
+		with open(index_path, 'r') as f:
+			for line in f:
+				place, timestamp, offset, length = line.rstrip('\n').split('\t')
+				entries.append((place, timestamp, int(offset), int(length)))
+		return entries
+
+	def read(self, place, timestamp):
+		# returns a single page, or None if it isn't archived
+		day = timestamp.split('_')[0]
+		archive_path, index_path = self._paths(day)
+		if not os.path.isfile(index_path):
+			return None
+
+		for p, t, offset, length in self.index(day):
+			if p == place and t == timestamp:
+				with open(archive_path, 'rb') as f:
+					f.seek(offset)
+					return gzip.decompress(f.read(length)).decode('utf-8')
+		return None
+
+	def iter_pages(self, day):
+		# yields (place, timestamp, html) for a whole day with one sequential read
+		archive_path, _ = self._paths(day)
+		with open(archive_path, 'rb') as f:
+			for place, timestamp, offset, length in self.index(day):
+				f.seek(offset)
+				yield place, timestamp, gzip.decompress(f.read(length)).decode('utf-8')
+
+	def prune(self, max_bytes):
+		# delete whole days, oldest first, until the archive fits in max_bytes
+		days = self.days()
+		sizes = {}
+		for day in days:
+			sizes[day] = sum(os.path.getsize(p) for p in self._paths(day) if os.path.isfile(p))
+		total = sum(sizes.values())
+
+		# the current day is always kept
+		for day in days[:-1]:
+			if total <= max_bytes:
+				break
+			for p in self._paths(day):
+				if os.path.isfile(p):
+					os.remove(p)
+			total -= sizes[day]
+
+def main():
+	import config
+
+	archive = HtmlArchive(config.HTML_ARCHIVE_DIR)
+	if len(sys.argv) == 3 and sys.argv[1] == 'list':
+		for place, timestamp, offset, length in archive.index(sys.argv[2]):
+			print(place, timestamp, offset, length, sep='\t')
+	elif len(sys.argv) == 5 and sys.argv[1] == 'extract':
+		html = archive.read(sys.argv[3], sys.argv[4])
+		if html is None:
+			sys.exit('not found')
+		sys.stdout.write(html)
+	else:
+		sys.exit(__doc__.strip())
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+'''
+Content-addressed cache of parsed popularity data, keyed by the page's html
+'''
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+
+class HtmlCache:
+	'''
+	The parsed data of a page is stored as <hash>.json, named by the sha256 of
+	the page's html, so an identical page is never parsed twice. The pages
+	themselves go to the compressed archive (html_archive.py).
+
+	The directory is kept under max_bytes by deleting the least recently used
+	entries first. Other files in the directory (e.g. old <place>.<run_time>.html
+	pages) are tracked and evicted the same way.
+	'''
+
+	def __init__(self, directory, max_bytes):
+		self.directory = directory
+		self.max_bytes = max_bytes
+
+		# entry name -> total size in bytes, least recently used first
+		self.entries = OrderedDict()
+		self.total_bytes = 0
+		self._load()
+
+	def _load(self):
+		# rebuild the LRU order from the file modification times
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+
+		found = {}
+		for f in os.scandir(self.directory):
+			if not f.is_file() or f.name.startswith('.'):
+				continue
+			name = f.name.split('.')[0] if self._is_hash_file(f.name) else f.name
+			st = f.stat()
+			size, mtime = found.get(name, (0, 0))
+			found[name] = (size + st.st_size, max(mtime, st.st_mtime))
+
+		for name, (size, _) in sorted(found.items(), key=lambda kv: kv[1][1]):
+			self.entries[name] = size
+			self.total_bytes += size
+
+	@staticmethod
+	def _is_hash_file(file_name):
+		stem, _, ext = file_name.partition('.')
+		return len(stem) == 64 and ext == 'json'
+
+	@staticmethod
+	def key(html):
+		return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+	def _path(self, key, ext):
+		return os.path.join(self.directory, key + '.' + ext)
+
+	def get_parsed(self, key):
+		# returns the parsed data for a page hash, or None if it was never parsed
+		path = self._path(key, 'json')
+		try:
+			with open(path, 'r') as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			return None
+
+		# mark as recently used, on disk too so the order survives restarts
+		os.utime(path)
+		if key in self.entries:
+			self.entries.move_to_end(key)
+		return data
+
+	def put(self, key, data):
+		path = self._path(key, 'json')
+		with open(path, 'w') as f:
+			json.dump(data, f)
+		size = os.path.getsize(path)
+
+		self.total_bytes += size - self.entries.pop(key, 0)
+		self.entries[key] = size
+		self.evict()
+
+	def evict(self):
+		while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+			name, size = self.entries.popitem(last=False)
+			self.total_bytes -= size
+			if self._is_hash_file(name + '.json'):
+				path = self._path(name, 'json')
+			else:
+				path = os.path.join(self.directory, name)
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
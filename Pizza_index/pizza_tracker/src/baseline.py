@@ -0,0 +1,142 @@
+# pizza_tracker/src/baseline.py
+
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import config, curve, models
+
+# Histogram of live readings per (place, day, hour), for quantiles.
+BIN_WIDTH = 5
+BINS = 256 // BIN_WIDTH + 1
+
+class BaselineModel:
+    """
+    Rolling statistics of live popularity readings for every (place, day, hour).
+
+    Each slot keeps an exponentially decayed weight, mean, variance and
+    histogram, so older readings fade out and an update or a score touches one
+    slot only, no matter how much history there is.
+    """
+
+    def __init__(self, decay: float = config.BASELINE_DECAY):
+        self.decay = decay
+        self._rows: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._weight = np.zeros((0, len(curve.DAYS), curve.HOURS))
+        self._mean = np.zeros_like(self._weight)
+        self._m2 = np.zeros_like(self._weight)
+        self._hist = np.zeros((0, len(curve.DAYS), curve.HOURS, BINS))
+
+    def _row(self, place_id: int) -> int:
+        row = self._rows.get(place_id)
+        if row is None:
+            row = len(self._rows)
+            if row == self._weight.shape[0]:
+                # Grow by doubling so adding places stays amortized O(1).
+                grow = max(1, row)
+                self._weight = np.concatenate([self._weight, np.zeros((grow,) + self._weight.shape[1:])])
+                self._mean = np.concatenate([self._mean, np.zeros((grow,) + self._mean.shape[1:])])
+                self._m2 = np.concatenate([self._m2, np.zeros((grow,) + self._m2.shape[1:])])
+                self._hist = np.concatenate([self._hist, np.zeros((grow,) + self._hist.shape[1:])])
+            self._rows[place_id] = row
+        return row
+
+    def update(self, place_id: int, day: int, hour: int, value: float) -> None:
+        """Folds a live reading into its slot."""
+        with self._lock:
+            idx = (self._row(place_id), day, hour)
+            weight = self._weight[idx] * self.decay + 1.0
+            delta = value - self._mean[idx]
+            mean = self._mean[idx] + delta / weight
+            # Weighted Welford update with exponential forgetting
+            self._m2[idx] = self._m2[idx] * self.decay + delta * (value - mean)
+            self._mean[idx] = mean
+            self._weight[idx] = weight
+
+            hist = self._hist[idx]
+            hist *= self.decay
+            hist[min(int(value) // BIN_WIDTH, BINS - 1)] += 1.0
+
+    def score(self, place_id: int, day: int, hour: int, value: float) -> Dict[str, Any]:
+        """
+        Scores a live reading against its slot: the z-score, the share of past
+        readings at or below it, and the (decayed) number of past readings.
+        """
+        with self._lock:
+            row = self._rows.get(place_id)
+            if row is None:
+                return {"z": None, "quantile": None, "samples": 0.0}
+            idx = (row, day, hour)
+            weight = float(self._weight[idx])
+            if weight == 0:
+                return {"z": None, "quantile": None, "samples": 0.0}
+            mean = float(self._mean[idx])
+            std = math.sqrt(max(float(self._m2[idx]) / weight, 0.0))
+            hist = self._hist[idx]
+            below = float(hist[: min(int(value) // BIN_WIDTH, BINS - 1) + 1].sum())
+            total = float(hist.sum())
+
+        # A slot that never varied gives no scale; fall back to half a bin width.
+        z = (value - mean) / max(std, BIN_WIDTH / 2)
+        return {"z": z, "quantile": below / total, "samples": weight}
+
+    def load(self, db: Session) -> int:
+        """Replays the stored live readings, oldest first. Returns the number replayed."""
+        stmt = (
+            select(
+                models.Scrape.place_id, models.Scrape.current_day,
+                models.Scrape.current_hour, models.Scrape.popularity_percent_current,
+            )
+            .where(models.Scrape.popularity_percent_current.is_not(None))
+            .order_by(models.Scrape.scrape_time)
+            .execution_options(yield_per=1000)
+        )
+        count = 0
+        for place_id, day, hour, value in db.execute(stmt):
+            self.update(place_id, day, hour, value)
+            count += 1
+        return count
+
+    def get_slot(self, place_id: int, day: int, hour: int) -> Dict[str, Any]:
+        """The statistics of one slot, as stored in `baseline_slots`."""
+        with self._lock:
+            idx = (self._row(place_id), day, hour)
+            return {
+                "place_id": place_id, "day": day, "hour": hour,
+                "weight": float(self._weight[idx]), "mean": float(self._mean[idx]),
+                "m2": float(self._m2[idx]), "hist": self._hist[idx].tobytes(),
+            }
+
+    def set_slot(self, place_id: int, day: int, hour: int, weight: float, mean: float, m2: float, hist: bytes) -> None:
+        with self._lock:
+            idx = (self._row(place_id), day, hour)
+            self._weight[idx] = weight
+            self._mean[idx] = mean
+            self._m2[idx] = m2
+            self._hist[idx] = np.frombuffer(hist, dtype=self._hist.dtype)
+
+    def clear(self, place_ids: Iterable[int]) -> None:
+        """Forgets everything about these places."""
+        with self._lock:
+            for place_id in place_ids:
+                row = self._rows.get(place_id)
+                if row is not None:
+                    self._weight[row] = 0
+                    self._mean[row] = 0
+                    self._m2[row] = 0
+                    self._hist[row] = 0
+
+    def slots(self) -> List[Tuple[int, int, int]]:
+        """The (place, day, hour) of every slot with readings."""
+        with self._lock:
+            places = {row: place_id for place_id, row in self._rows.items()}
+            rows, days, hours = np.nonzero(self._weight)
+            return [(places[r], int(d), int(h)) for r, d, h in zip(rows, days, hours)]
+
+# The process-wide model, fed by storage.save_round
+model = BaselineModel()
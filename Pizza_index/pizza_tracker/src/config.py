@@ -1,10 +1,138 @@
 # pizza_tracker/src/config.py
 
+import json
 import os
 
 # Chrome/Selenium configuration
 CHROME_BINARY_LOCATION = os.environ.get("CHROME_BINARY_LOCATION")
 CHROMEDRIVER_BINARY_LOCATION = os.environ.get("CHROMEDRIVER_BINARY_LOCATION")
 
+# Browser profile: "light" blocks images, map tiles, fonts and media, turns off
+# the GPU and extensions and caps the renderer's JavaScript heap at
+# BROWSER_MAX_HEAP_MB; "default" loads pages like a normal Chrome.
+BROWSER_PROFILE = os.environ.get("BROWSER_PROFILE", "light")
+BROWSER_MAX_HEAP_MB = int(os.environ.get("BROWSER_MAX_HEAP_MB", "512"))
+# URL patterns the light profile blocks, comma separated
+BROWSER_BLOCKED_URLS = [
+    u.strip() for u in os.environ.get(
+        "BROWSER_BLOCKED_URLS",
+        "*.png,*.jpg,*.jpeg,*.gif,*.webp,*.ico,*.woff,*.woff2,*.ttf,*.otf,"
+        "*.mp4,*.webm,*.mp3,*/maps/vt*,*/kh?v=*,*.googleusercontent.com/*,*fonts.googleapis.com/*",
+    ).split(",") if u.strip()
+]
+
 # Database configuration
 DATABASE_URL = os.environ.get("DATABASE_URL", "postgresql://user:password@db:5432/pizza_tracker")
+# Defaults to DATABASE_URL with an asyncio driver (asyncpg, or aiosqlite for SQLite)
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+
+# Browser session pool: number of warm Chrome sessions kept alive, and how many
+# pages a session may load before it is recycled.
+DRIVER_POOL_SIZE = int(os.environ.get("DRIVER_POOL_SIZE", "2"))
+DRIVER_MAX_PAGES = int(os.environ.get("DRIVER_MAX_PAGES", "50"))
+
+# Scrape rounds: how often all places are scraped together, how many run at
+# once, and the minimum gap in seconds between requests to the same domain.
+SCRAPE_INTERVAL_HOURS = float(os.environ.get("SCRAPE_INTERVAL_HOURS", "24"))
+SCRAPE_WORKERS = int(os.environ.get("SCRAPE_WORKERS", str(DRIVER_POOL_SIZE)))
+SCRAPE_DOMAIN_MIN_INTERVAL = float(os.environ.get("SCRAPE_DOMAIN_MIN_INTERVAL", "2.0"))
+
+# "adaptive" scrapes, every SCHEDULER_TICK_MINUTES, the places that matter most
+# right now: around their usual peak hours and when their readings deviate from
+# normal, not when they are closed. At most SCRAPE_BUDGET_PER_HOUR scrapes per
+# hour, no place more often than every PLACE_MIN_INTERVAL_MINUTES, and every
+# place at least every SCRAPE_INTERVAL_HOURS. "fixed" scrapes all places
+# together every SCRAPE_INTERVAL_HOURS.
+SCHEDULER_MODE = os.environ.get("SCHEDULER_MODE", "adaptive")
+SCHEDULER_TICK_MINUTES = float(os.environ.get("SCHEDULER_TICK_MINUTES", "10"))
+SCRAPE_BUDGET_PER_HOUR = float(os.environ.get("SCRAPE_BUDGET_PER_HOUR", "12"))
+PLACE_MIN_INTERVAL_MINUTES = float(os.environ.get("PLACE_MIN_INTERVAL_MINUTES", "60"))
+
+# Where scrapes run: "local" in the scheduler's process; "sql" or "redis" as
+# jobs of up to JOB_BATCH_SIZE URLs, run by `python -m src.main worker`
+# processes. A worker that dies loses its job's lease after JOB_LEASE_SECONDS
+# and the job goes to another worker. Only one process runs the scheduler,
+# unless RUN_SCHEDULER is false in all of them.
+SCRAPE_QUEUE = os.environ.get("SCRAPE_QUEUE", "local")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", "10"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "900"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "2"))
+RUN_SCHEDULER = os.environ.get("RUN_SCHEDULER", "true").lower() in ("1", "true", "yes")
+SCHEDULER_LOCK_FILE = os.environ.get("SCHEDULER_LOCK_FILE", "/tmp/pizza_tracker_scheduler.lock")
+# Workers record the scrape metrics, so each serves its own /metrics on this
+# port for Prometheus to scrape; 0 turns it off.
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", "9100"))
+# How often API processes that don't scrape check the database for new rounds to push to /api/events
+EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", "5"))
+
+# Round journal: finished scrapes are saved every ROUND_CHECKPOINT_EVERY URLs,
+# so a round that dies is resumed where it stopped. A failed URL is tried up to
+# RETRY_MAX_ATTEMPTS times, waiting RETRY_BACKOFF_SECONDS, then twice as long, ...
+ROUND_CHECKPOINT_EVERY = int(os.environ.get("ROUND_CHECKPOINT_EVERY", "10"))
+RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_SECONDS = float(os.environ.get("RETRY_BACKOFF_SECONDS", "30"))
+
+# Waiting for a rendered page: the timeout of a place is the p95 of its last
+# READY_WINDOW load times times READY_TIMEOUT_MARGIN, kept between
+# READY_TIMEOUT_MIN and READY_TIMEOUT_MAX (used until READY_MIN_SAMPLES loads
+# were seen). A place panel still without popular times READY_NO_DATA_GRACE
+# seconds after it rendered has none.
+READY_TIMEOUT_MIN = float(os.environ.get("READY_TIMEOUT_MIN", "5"))
+READY_TIMEOUT_MAX = float(os.environ.get("READY_TIMEOUT_MAX", "30"))
+READY_TIMEOUT_MARGIN = float(os.environ.get("READY_TIMEOUT_MARGIN", "1.5"))
+READY_MIN_SAMPLES = int(os.environ.get("READY_MIN_SAMPLES", "5"))
+READY_WINDOW = int(os.environ.get("READY_WINDOW", "50"))
+READY_NO_DATA_GRACE = float(os.environ.get("READY_NO_DATA_GRACE", "3"))
+
+# Use PostgreSQL COPY for bulk writes when the psycopg2 driver is in use.
+BULK_USE_COPY = os.environ.get("BULK_USE_COPY", "true").lower() in ("1", "true", "yes")
+
+# A place is flagged as abnormal when its live popularity exceeds its usual
+# popularity for that hour by this factor.
+ANOMALY_RATIO = float(os.environ.get("ANOMALY_RATIO", "1.5"))
+
+# How popular times are fetched: "selenium" renders the page in Chrome, "http"
+# reads the page over plain HTTP, "auto" tries HTTP first and falls back to
+# Chrome. FETCH_BACKEND_BY_PLACE overrides it per place, as a JSON object
+# mapping place names to backends.
+FETCH_BACKEND = os.environ.get("FETCH_BACKEND", "selenium")
+FETCH_BACKEND_BY_PLACE = json.loads(os.environ.get("FETCH_BACKEND_BY_PLACE", "{}"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "15"))
+HTTP_USER_AGENT = os.environ.get(
+    "HTTP_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+)
+
+# How popular times bars are found in a page: "fast" (tag scanner), "lxml" or "bs4".
+PARSER_BACKEND = os.environ.get("PARSER_BACKEND", "fast")
+
+# Parquet export of the scrape history. The scheduler appends new scrapes every
+# PARQUET_EXPORT_INTERVAL_HOURS; 0 disables the job.
+PARQUET_EXPORT_DIR = os.environ.get("PARQUET_EXPORT_DIR", "data/parquet")
+PARQUET_EXPORT_INTERVAL_HOURS = float(os.environ.get("PARQUET_EXPORT_INTERVAL_HOURS", "24"))
+# Scrape ids can commit out of order (concurrent rounds and workers), so each
+# export looks this many ids back from the last one exported and skips ids it
+# already wrote.
+PARQUET_EXPORT_ID_MARGIN = int(os.environ.get("PARQUET_EXPORT_ID_MARGIN", "5000"))
+
+# Baseline model of live readings. Each new reading of a (place, day, hour)
+# scales the weight of the older ones by BASELINE_DECAY. Once a slot has
+# BASELINE_MIN_SAMPLES readings, a place is abnormal when its z-score reaches
+# BASELINE_Z_THRESHOLD; before that, ANOMALY_RATIO applies.
+BASELINE_DECAY = float(os.environ.get("BASELINE_DECAY", "0.97"))
+BASELINE_MIN_SAMPLES = float(os.environ.get("BASELINE_MIN_SAMPLES", "8"))
+BASELINE_Z_THRESHOLD = float(os.environ.get("BASELINE_Z_THRESHOLD", "2.5"))
+
+# Pizza index: the mean current-vs-normal ratio over all places, materialized
+# per INDEX_BUCKET_MINUTES bucket. Served from a cache that writes invalidate;
+# INDEX_CACHE_TTL bounds staleness when another process wrote.
+INDEX_BUCKET_MINUTES = int(os.environ.get("INDEX_BUCKET_MINUTES", "60"))
+INDEX_CACHE_TTL = float(os.environ.get("INDEX_CACHE_TTL", "60"))
+
+# Server-sent events at /api/events: each client gets up to SSE_QUEUE_SIZE
+# pending events (the oldest are dropped beyond that) and a keep-alive comment
+# every SSE_KEEPALIVE_SECONDS.
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.environ.get("SSE_KEEPALIVE_SECONDS", "15"))
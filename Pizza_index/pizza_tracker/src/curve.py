@@ -0,0 +1,94 @@
+# pizza_tracker/src/curve.py
+
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import LargeBinary, SmallInteger
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import TypeDecorator
+
+# gmaps starts their weeks on sunday
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+HOURS = 24
+SLOTS = len(DAYS) * HOURS
+
+# Byte used for "no data" (e.g. closed) hours in the packed representation.
+_MISSING = 255
+
+def slot(day_index: int, hour: int) -> int:
+    """Returns the position of a (day, hour) pair in a weekly curve."""
+    return day_index * HOURS + hour
+
+def curve_from_items(items: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """Builds a 7x24 weekly curve from the per-hour dicts returned by the scraper."""
+    curve: List[Optional[int]] = [None] * SLOTS
+    for item in items:
+        day_index = DAY_INDEX.get(item['day_of_week'])
+        hour = item['hour_of_day']
+        value = item['popularity_percent_normal']
+        if day_index is None or not 0 <= hour < HOURS or value is None:
+            continue
+        curve[slot(day_index, hour)] = int(value)
+    return curve
+
+def current_from_items(items: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """Returns the live reading (day index, hour and percent), if the page had one."""
+    for item in items:
+        if item.get('popularity_percent_current') is not None:
+            return {
+                'current_day': DAY_INDEX[item['day_of_week']],
+                'current_hour': item['hour_of_day'],
+                'popularity_percent_current': int(item['popularity_percent_current']),
+            }
+    return None
+
+def pack(curve: List[Optional[int]]) -> bytes:
+    """Packs a weekly curve into one byte per hour."""
+    return bytes(_MISSING if v is None else max(0, min(int(v), _MISSING - 1)) for v in curve)
+
+def unpack(data: bytes) -> List[Optional[int]]:
+    """Reverses `pack`."""
+    return [None if b == _MISSING else b for b in data]
+
+class WeeklyCurve(TypeDecorator):
+    """
+    A 7x24 popularity curve, exposed to Python as a list of 168 optional ints.
+
+    Stored as a `smallint[]` on PostgreSQL and as 168 packed bytes elsewhere.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(ARRAY(SmallInteger))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return pack(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return unpack(value)
+
+def expand(curve: List[Optional[int]], current: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the curve back as per-hour dicts in the scraper's format, skipping
+    hours without data.
+    """
+    current_slot = None
+    if current and current.get('current_day') is not None:
+        current_slot = slot(current['current_day'], current['current_hour'])
+    for i, value in enumerate(curve):
+        if value is None:
+            continue
+        yield {
+            'day_of_week': DAYS[i // HOURS],
+            'hour_of_day': i % HOURS,
+            'popularity_percent_normal': value,
+            'popularity_percent_current': current['popularity_percent_current'] if i == current_slot else None,
+        }
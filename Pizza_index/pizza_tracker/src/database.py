@@ -1,11 +1,33 @@
 # pizza_tracker/src/database.py
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .config import DATABASE_URL
+from .config import DATABASE_URL, ASYNC_DATABASE_URL
+
+def to_async_url(url: str) -> str:
+    """Swaps the driver in a database URL for its asyncio counterpart."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect == "postgresql":
+        return f"postgresql+asyncpg{sep}{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+# Upserts use ON CONFLICT, which only these dialects are wired up for.
+SUPPORTED_DIALECTS = ("postgresql", "sqlite")
 
 engine = create_engine(DATABASE_URL)
+if engine.dialect.name not in SUPPORTED_DIALECTS:
+    raise RuntimeError(
+        f"DATABASE_URL uses {engine.dialect.name}; pizza_tracker supports {' and '.join(SUPPORTED_DIALECTS)} only"
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the API's read endpoints so queries don't block the event loop.
+async_engine = create_async_engine(ASYNC_DATABASE_URL or to_async_url(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
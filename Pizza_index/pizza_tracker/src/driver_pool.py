@@ -0,0 +1,180 @@
+# pizza_tracker/src/driver_pool.py
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import config
+
+
+class _PooledDriver:
+    """A WebDriver session plus the bookkeeping the pool needs to recycle it."""
+
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+
+class DriverPool:
+    """
+    A bounded pool of warm headless-Chrome sessions.
+
+    At most `size` sessions exist at any time. A session is recycled (quit and
+    lazily replaced) after `max_pages` scrapes, or as soon as a scrape using it
+    raises an exception, since a crashed Chrome can't be trusted afterwards.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 2, max_pages: int = 50):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._factory = factory
+        self._size = size
+        self._max_pages = max_pages
+        self._idle: "queue.LifoQueue[_PooledDriver]" = queue.LifoQueue()
+        # One slot per session that may exist; checkout blocks on this.
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._live: List[_PooledDriver] = []
+        self._closed = False
+
+        self._created = 0
+        self._recycled = 0
+        self._crashed = 0
+        self._checkouts = 0
+        self._reuses = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Checks out a driver for the duration of the `with` block.
+
+        Raises TimeoutError if no session becomes free within `timeout` seconds.
+        """
+        entry = self._checkout(timeout)
+        try:
+            yield entry.driver
+        except BaseException:
+            self._discard(entry, crashed=True)
+            raise
+        else:
+            self._checkin(entry)
+
+    def _checkout(self, timeout: Optional[float]) -> _PooledDriver:
+        if self._closed:
+            raise RuntimeError("driver pool is closed")
+
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("timed out waiting for a free browser session")
+        waited = time.monotonic() - started
+
+        try:
+            entry = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            try:
+                entry = _PooledDriver(self._factory())
+            except BaseException:
+                self._slots.release()
+                raise
+            reused = False
+
+        with self._lock:
+            if not reused:
+                self._created += 1
+                self._live.append(entry)
+            self._checkouts += 1
+            self._reuses += int(reused)
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return entry
+
+    def _checkin(self, entry: _PooledDriver) -> None:
+        entry.pages += 1
+        if self._closed or entry.pages >= self._max_pages:
+            self._discard(entry)
+            return
+        self._idle.put(entry)
+        self._slots.release()
+
+    def _discard(self, entry: _PooledDriver, crashed: bool = False) -> None:
+        with self._lock:
+            if entry in self._live:
+                self._live.remove(entry)
+            if crashed:
+                self._crashed += 1
+            else:
+                self._recycled += 1
+        _quit(entry.driver)
+        self._slots.release()
+
+    def close(self) -> None:
+        """Quits every session, idle or not. Checked-out sessions are quit on return."""
+        self._closed = True
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                if entry in self._live:
+                    self._live.remove(entry)
+            _quit(entry.driver)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns counters describing session reuse and checkout waits."""
+        with self._lock:
+            return {
+                "size": self._size,
+                "live": len(self._live),
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "recycled": self._recycled,
+                "crashed": self._crashed,
+                "checkouts": self._checkouts,
+                "reuses": self._reuses,
+                "reuse_ratio": self._reuses / self._checkouts if self._checkouts else 0.0,
+                "wait_seconds_total": self._wait_total,
+                "wait_seconds_avg": self._wait_total / self._checkouts if self._checkouts else 0.0,
+                "wait_seconds_max": self._wait_max,
+            }
+
+
+def _quit(driver: Any) -> None:
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Error quitting browser session: {e}")
+
+
+_pool: Optional[DriverPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> DriverPool:
+    """Returns the process-wide driver pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            from .scraper import create_driver
+            _pool = DriverPool(create_driver, size=config.DRIVER_POOL_SIZE, max_pages=config.DRIVER_MAX_PAGES)
+        return _pool
+
+
+def close_pool() -> None:
+    """Shuts down the process-wide driver pool, if one was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            print(f"Closing driver pool: {_pool.stats()}")
+            _pool.close()
+            _pool = None
@@ -0,0 +1,151 @@
+# pizza_tracker/src/events.py
+
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select
+
+from . import config, models, status
+from .database import SessionLocal
+
+def format_event(event: str, data: Any) -> str:
+    """Encodes one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+class Broadcaster:
+    """
+    Fans events out from the scheduler's threads to every connected client.
+
+    Events are encoded once when published and handed to the event loop, which
+    copies them into a bounded queue per client. The latest status is kept so
+    a new client starts from it without querying the database.
+    """
+
+    def __init__(self, queue_size: int = config.SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self._queues: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Registers a client. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+
+    @property
+    def clients(self) -> int:
+        return len(self._queues)
+
+    def _fanout(self, message: str) -> None:
+        for queue in list(self._queues):
+            if queue.full():
+                # A client that can't keep up loses its oldest events, not the newest.
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def publish(self, event: str, data: Any) -> None:
+        """Sends an event to every client. Safe to call from any thread."""
+        message = format_event(event, data)
+        with self._lock:
+            if event == "status":
+                self.snapshot = data
+            loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._fanout, message)
+        except RuntimeError:
+            # the loop was closed in the meantime
+            pass
+
+    async def stream(self, initial: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yields the current status, then every event published until the client leaves."""
+        queue = self.subscribe()
+        try:
+            yield format_event("status", self.snapshot or initial)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), config.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+broadcaster = Broadcaster()
+
+def _statuses(snapshot: Optional[Dict[str, Any]]) -> Any:
+    if snapshot is None:
+        return None
+    return snapshot["status"], sorted((p["place"], p["status"]) for p in snapshot["places"])
+
+def publish_round(scrape_time: datetime) -> None:
+    """
+    Reads the status once after a round is saved and publishes the places
+    scraped in it, plus the whole status when any place changed status.
+    """
+    with SessionLocal() as db:
+        current = status.read_status(db)
+    readings: List[Dict[str, Any]] = [p for p in current["places"] if p["scrape_time"] == scrape_time]
+    for place in readings:
+        broadcaster.publish("reading", place)
+    if _statuses(current) != _statuses(broadcaster.snapshot):
+        broadcaster.publish("status", current)
+    else:
+        # no transition, but new clients should still start from the latest readings
+        broadcaster.snapshot = current
+
+def _round_sizes(since: datetime) -> Dict[datetime, int]:
+    """The number of scrapes saved per scrape time since `since`."""
+    with SessionLocal() as db:
+        return dict(db.execute(
+            select(models.Scrape.scrape_time, func.count())
+            .where(models.Scrape.scrape_time >= since)
+            .group_by(models.Scrape.scrape_time)
+        ).all())
+
+def settled_rounds(
+    previous: Dict[datetime, int], current: Dict[datetime, int], published: Dict[datetime, int],
+) -> List[datetime]:
+    """
+    The rounds to publish: those that grew since they were last published and
+    didn't grow since the previous poll, so a round whose batches are still
+    being saved is published once, when they are all in.
+    """
+    return [
+        t for t in sorted(current)
+        if current[t] == previous.get(t) and current[t] != published.get(t)
+    ]
+
+async def watch_rounds() -> None:
+    """
+    Publishes rounds saved by other processes, e.g. scraping workers, by polling
+    the number of scrapes per scrape time every EVENTS_POLL_SECONDS. Counting,
+    rather than following scrape ids, also catches batches that commit late.
+    Runs until cancelled.
+    """
+    def since() -> datetime:
+        return datetime.now() - timedelta(hours=config.SCRAPE_INTERVAL_HOURS)
+
+    published = await asyncio.to_thread(_round_sizes, since())
+    previous = published
+    while True:
+        await asyncio.sleep(config.EVENTS_POLL_SECONDS)
+        try:
+            current = await asyncio.to_thread(_round_sizes, since())
+            for scrape_time in settled_rounds(previous, current, published):
+                await asyncio.to_thread(publish_round, scrape_time)
+                published[scrape_time] = current[scrape_time]
+            previous = current
+            published = {t: n for t, n in published.items() if t in current}
+        except Exception as e:
+            print(f"Failed to poll for new rounds: {e}")
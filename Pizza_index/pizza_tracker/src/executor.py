@@ -0,0 +1,106 @@
+# pizza_tracker/src/executor.py
+
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from . import config, metrics, scraper
+
+
+class DomainRateLimiter:
+    """
+    Spaces out request starts so that no domain is hit more than once every
+    `min_interval` seconds, regardless of how many workers are running.
+    """
+
+    def __init__(self, min_interval: float):
+        self._min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Blocks until a request to the domain of `url` may start."""
+        if self._min_interval <= 0:
+            return
+        domain = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(domain, now))
+            # Reserve the slot before sleeping so concurrent callers queue up behind it.
+            self._next_slot[domain] = start + self._min_interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ScrapeExecutor:
+    """
+    Scrapes a batch of URLs concurrently and returns the results together, so a
+    whole round can be persisted at once under a single scrape time.
+    """
+
+    def __init__(
+        self,
+        workers: int = config.SCRAPE_WORKERS,
+        domain_min_interval: float = config.SCRAPE_DOMAIN_MIN_INTERVAL,
+        fetch: Optional[Callable[[str], List[Dict[str, Any]]]] = None,
+    ):
+        self._workers = max(1, workers)
+        self._limiter = DomainRateLimiter(domain_min_interval)
+        self._fetch = fetch
+
+    def _scrape_one(self, url: str) -> Optional[List[Dict[str, Any]]]:
+        self._limiter.wait(url)
+        print(f"Scraping {url}...")
+        place = scraper.place_name_from_url(url)
+        started = time.monotonic()
+        try:
+            fetch = self._fetch or scraper.get_popular_times
+            data = fetch(url)
+        except Exception as e:
+            metrics.SCRAPES.labels(place, "error").inc()
+            print(f"Error scraping {url}: {e}")
+            return None
+        finally:
+            metrics.PLACE_SECONDS.labels(place).observe(time.monotonic() - started)
+
+        if data:
+            metrics.SCRAPES.labels(place, "success").inc()
+            metrics.LAST_SUCCESS.labels(place).set_to_current_time()
+        else:
+            metrics.SCRAPES.labels(place, "no_data").inc()
+        return data
+
+    def run_round(
+        self,
+        urls: List[str],
+        on_result: Optional[Callable[[str, Optional[List[Dict[str, Any]]]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Scrapes every URL and returns one `{"url": ..., "data": [...]}` entry per
+        URL that produced data, in the order the URLs were given.
+
+        `on_result(url, data)` is called in the calling thread as each URL
+        finishes, with None or an empty list for URLs that produced nothing.
+        """
+        if not urls:
+            return []
+        scraped: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        with ThreadPoolExecutor(max_workers=min(self._workers, len(urls)), thread_name_prefix="scrape") as pool:
+            futures = {pool.submit(self._scrape_one, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                scraped[url] = future.result()
+                if on_result is not None:
+                    on_result(url, scraped[url])
+
+        results = []
+        for url in urls:
+            data = scraped[url]
+            if data:
+                results.append({"url": url, "data": data})
+            else:
+                print(f"No data scraped for {url}.")
+        return results
@@ -0,0 +1,118 @@
+# pizza_tracker/src/export.py
+
+import json
+import os
+from typing import Any, Dict, List, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import config, history, models
+from .database import SessionLocal
+
+# Scrapes converted per batch; each batch becomes one file per partition.
+BATCH_SCRAPES = 1000
+
+STATE_FILE = "_export_state.json"
+
+SCHEMA = pa.schema([
+    ("scrape_id", pa.int64()),
+    ("scrape_time", pa.timestamp("us")),
+    ("url", pa.dictionary(pa.int32(), pa.string())),
+    ("day_of_week", pa.dictionary(pa.int8(), pa.string())),
+    ("hour_of_day", pa.int8()),
+    ("popularity_percent_normal", pa.int16()),
+    ("popularity_percent_current", pa.int16()),
+    # partition columns
+    ("place", pa.string()),
+    ("month", pa.string()),
+])
+
+def _read_state(out_dir: str) -> Tuple[int, Set[int]]:
+    """The highest scrape id exported, and the ids exported within the margin below it."""
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return 0, set()
+    last = state["last_scrape_id"]
+    if "recent_ids" not in state:
+        # written before the margin existed: everything up to the watermark is exported
+        return last, set(range(max(0, last - config.PARQUET_EXPORT_ID_MARGIN) + 1, last + 1))
+    return last, set(state["recent_ids"])
+
+def _write_state(out_dir: str, last_scrape_id: int, recent_ids: Set[int]) -> None:
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"last_scrape_id": last_scrape_id, "recent_ids": sorted(recent_ids)}, f)
+    os.replace(path + ".tmp", path)
+
+def _write_batch(out_dir: str, scrapes: List[Any]) -> int:
+    columns: Dict[str, List[Any]] = {field.name: [] for field in SCHEMA}
+    slots = history.slots_for()
+    for s in scrapes:
+        month = s.scrape_time.strftime("%Y-%m")
+        for _, row in history.rows_for_scrape(s, slots):
+            columns["scrape_id"].append(s.id)
+            columns["month"].append(month)
+            for name in ("scrape_time", "url", "day_of_week", "hour_of_day",
+                         "popularity_percent_normal", "popularity_percent_current", "place"):
+                columns[name].append(row[name])
+
+    table = pa.Table.from_pydict(columns, schema=SCHEMA)
+    if table.num_rows:
+        pq.write_to_dataset(
+            table,
+            root_path=out_dir,
+            partition_cols=["place", "month"],
+            # Unique per batch, so incremental runs add files rather than overwrite them.
+            basename_template=f"part-{scrapes[0].id}-{scrapes[-1].id}-{{i}}.parquet",
+            use_dictionary=True,
+            compression="zstd",
+        )
+    return table.num_rows
+
+def export_parquet(out_dir: str = config.PARQUET_EXPORT_DIR) -> int:
+    """
+    Appends the scrapes added since the last export to a Parquet dataset
+    partitioned by place and month. Returns the number of rows written.
+
+    Scrapes that committed after a higher id was exported are picked up as
+    long as they are within PARQUET_EXPORT_ID_MARGIN ids of it.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    margin = config.PARQUET_EXPORT_ID_MARGIN
+    watermark, recent = _read_state(out_dir)
+    stmt = (
+        history.select_scrapes()
+        .where(models.Scrape.id > watermark - margin)
+        .execution_options(yield_per=history.YIELD_PER)
+    )
+
+    written = 0
+    db = SessionLocal()
+
+    def flush(batch: List[Any]) -> int:
+        nonlocal watermark, recent
+        count = _write_batch(out_dir, batch)
+        watermark = max(watermark, batch[-1].id)
+        recent = {i for i in recent | {s.id for s in batch} if i > watermark - margin}
+        _write_state(out_dir, watermark, recent)
+        return count
+
+    try:
+        batch = []
+        for s in db.execute(stmt):
+            if s.id in recent:
+                continue
+            batch.append(s)
+            if len(batch) == BATCH_SCRAPES:
+                written += flush(batch)
+                batch = []
+        if batch:
+            written += flush(batch)
+    finally:
+        db.close()
+
+    print(f"Exported {written} rows to {out_dir}.")
+    return written
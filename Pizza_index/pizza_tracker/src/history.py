@@ -0,0 +1,121 @@
+# pizza_tracker/src/history.py
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Select, select
+
+from . import curve, models
+
+ROW_FIELDS = (
+    'place', 'url', 'scrape_time', 'day_of_week', 'hour_of_day',
+    'popularity_percent_normal', 'popularity_percent_current',
+)
+
+# Rows fetched per round trip when iterating over scrapes with a server-side cursor.
+YIELD_PER = 500
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parses a `<scrape id>.<slot>` keyset cursor. Raises ValueError if malformed."""
+    if not cursor:
+        return None
+    scrape_id, slot = cursor.split('.')
+    return int(scrape_id), int(slot)
+
+def format_cursor(scrape_id: int, slot: int) -> str:
+    return f"{scrape_id}.{slot}"
+
+def select_scrapes(
+    place: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Tuple[int, int]] = None,
+) -> Select:
+    """Selects the scrapes matching the filters that can be applied in SQL, in keyset order."""
+    stmt = (
+        select(
+            models.Scrape.id, models.Scrape.scrape_time, models.Scrape.normal_curve,
+            models.Scrape.current_day, models.Scrape.current_hour, models.Scrape.popularity_percent_current,
+            models.Place.name, models.Place.url,
+        )
+        .join(models.Place, models.Scrape.place_id == models.Place.id)
+        .order_by(models.Scrape.id)
+    )
+    if place is not None:
+        stmt = stmt.where(models.Place.name == place)
+    if start is not None:
+        stmt = stmt.where(models.Scrape.scrape_time >= start)
+    if end is not None:
+        stmt = stmt.where(models.Scrape.scrape_time < end)
+    if after is not None:
+        stmt = stmt.where(models.Scrape.id >= after[0])
+    return stmt
+
+def slots_for(day_of_week: Optional[str] = None, hour: Optional[int] = None) -> List[int]:
+    """Returns the curve slots selected by the day and hour filters. Raises ValueError for unknown days."""
+    if day_of_week is not None and day_of_week not in curve.DAY_INDEX:
+        raise ValueError(f"unknown day_of_week: {day_of_week}")
+    days = [curve.DAY_INDEX[day_of_week]] if day_of_week is not None else range(len(curve.DAYS))
+    hours = [hour] if hour is not None else range(curve.HOURS)
+    return [curve.slot(d, h) for d in days for h in hours]
+
+def rows_for_scrape(
+    s: Any,
+    slots: List[int],
+    after: Optional[Tuple[int, int]] = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Expands one scrape into per-hour rows restricted to `slots`, yielding each
+    row with the cursor that resumes right after it.
+    """
+    current_slot = None
+    if s.current_day is not None:
+        current_slot = curve.slot(s.current_day, s.current_hour)
+    for i in slots:
+        if after is not None and s.id == after[0] and i <= after[1]:
+            continue
+        normal = s.normal_curve[i]
+        if normal is None:
+            continue
+        yield format_cursor(s.id, i), {
+            'place': s.name,
+            'url': s.url,
+            'scrape_time': s.scrape_time,
+            'day_of_week': curve.DAYS[i // curve.HOURS],
+            'hour_of_day': i % curve.HOURS,
+            'popularity_percent_normal': normal,
+            'popularity_percent_current': s.popularity_percent_current if i == current_slot else None,
+        }
+
+async def iter_rows(
+    scrapes: AsyncIterable[Any],
+    slots: List[int],
+    after: Optional[Tuple[int, int]] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Expands a stream of scrapes into per-hour rows, see `rows_for_scrape`."""
+    async for s in scrapes:
+        for item in rows_for_scrape(s, slots, after):
+            yield item
+
+def _jsonable(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {**row, 'scrape_time': row['scrape_time'].isoformat()}
+
+async def ndjson_lines(rows: AsyncIterable[Tuple[str, Dict[str, Any]]]) -> AsyncIterator[str]:
+    async for _, row in rows:
+        yield json.dumps(_jsonable(row)) + '\n'
+
+async def csv_lines(rows: AsyncIterable[Tuple[str, Dict[str, Any]]]) -> AsyncIterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(ROW_FIELDS)
+    async for _, row in rows:
+        writer.writerow(['' if row[f] is None else row[f] for f in ROW_FIELDS])
+        # Flush in chunks rather than per row to keep the number of writes down.
+        if buf.tell() > 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
@@ -0,0 +1,128 @@
+# pizza_tracker/src/http_fetch.py
+
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config, metrics
+
+# gmaps starts their weeks on sunday; the embedded payload numbers days 1 (Monday) to 7 (Sunday)
+days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+_PAYLOAD_MARKER = 'window.APP_INITIALIZATION_STATE='
+# Prefix Google puts in front of JSON responses embedded as strings in the payload
+_XSSI_PREFIX = ")]}'"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Returns the process-wide HTTP session, whose connections are reused across scrapes."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'User-Agent': config.HTTP_USER_AGENT,
+                # German, like the browser, for the 24h time format
+                'Accept-Language': 'de-DE,de;q=0.9',
+            })
+            _session = session
+        return _session
+
+@metrics.STAGE_SECONDS.labels('http_fetch').time()
+def fetch_html(url: str) -> Optional[str]:
+    """
+    Gets the HTML source of a Google Maps page over plain HTTP, without rendering it.
+    """
+    try:
+        response = get_session().get(url, timeout=config.HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred in fetch_html: {e}")
+        return None
+
+def _extract_payload(html: str) -> Optional[Any]:
+    start = html.find(_PAYLOAD_MARKER)
+    if start == -1:
+        return None
+    try:
+        payload, _ = json.JSONDecoder().raw_decode(html, start + len(_PAYLOAD_MARKER))
+    except ValueError:
+        return None
+    return payload
+
+def _is_hour(entry: Any) -> bool:
+    return (
+        isinstance(entry, list) and len(entry) >= 2
+        and isinstance(entry[0], int) and 0 <= entry[0] <= 23
+        and isinstance(entry[1], int)
+    )
+
+def _is_week(node: Any) -> bool:
+    """Recognizes the `[[day_no, [[hour, percent, ...], ...], ...], ...]` popular times array."""
+    if not isinstance(node, list) or not 1 <= len(node) <= 7:
+        return False
+    seen = set()
+    has_hours = False
+    for day in node:
+        if not isinstance(day, list) or not day or not isinstance(day[0], int) or not 1 <= day[0] <= 7:
+            return False
+        if day[0] in seen:
+            return False
+        seen.add(day[0])
+        if len(day) > 1 and day[1] is not None:
+            if not isinstance(day[1], list) or not all(_is_hour(h) for h in day[1]):
+                return False
+            has_hours = has_hours or bool(day[1])
+    return has_hours
+
+def _find_week(node: Any, depth: int = 0) -> Optional[List[Any]]:
+    if depth > 64:
+        return None
+    if isinstance(node, str):
+        # Nested payloads are embedded as JSON strings
+        if node.startswith(_XSSI_PREFIX):
+            try:
+                return _find_week(json.loads(node[len(_XSSI_PREFIX):]), depth + 1)
+            except ValueError:
+                return None
+        return None
+    if not isinstance(node, list):
+        return None
+    if _is_week(node):
+        return node
+    for child in node:
+        found = _find_week(child, depth + 1)
+        if found is not None:
+            return found
+    return None
+
+def parse_payload(html: str) -> List[Dict[str, Any]]:
+    """
+    Parses the popularity arrays from the data Maps embeds in the page, in the
+    same format as `scraper.parse_html`. The payload has no live reading, so
+    `popularity_percent_current` is always None.
+    """
+    payload = _extract_payload(html)
+    week = _find_week(payload) if payload is not None else None
+    if week is None:
+        return []
+
+    data = []
+    for day in sorted(week, key=lambda d: d[0] % 7):
+        for hour in (day[1] if len(day) > 1 and day[1] else []):
+            data.append({
+                "day_of_week": days[day[0] % 7],
+                "hour_of_day": hour[0],
+                "popularity_percent_normal": hour[1],
+                "popularity_percent_current": None,
+            })
+    return data
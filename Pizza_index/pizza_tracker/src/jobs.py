@@ -0,0 +1,198 @@
+# pizza_tracker/src/jobs.py
+
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, or_, select, update
+try:
+    import redis
+except ImportError:  # optional, only needed for SCRAPE_QUEUE=redis
+    redis = None
+
+from . import config, models
+from .database import SessionLocal
+
+# A job as handed to a worker: its queue id (or raw message) and its payload
+Job = Tuple[Any, Dict[str, Any]]
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def make_jobs(urls: List[str], scrape_time: datetime, batch_size: int = config.JOB_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Splits a round into job payloads that share its scrape time."""
+    batch_size = max(1, batch_size)
+    return [
+        {"urls": urls[i:i + batch_size], "scrape_time": scrape_time.isoformat()}
+        for i in range(0, len(urls), batch_size)
+    ]
+
+class SqlQueue:
+    """
+    Jobs in the `scrape_jobs` table. A worker claims the oldest claimable job
+    with a conditional UPDATE, so two workers never get the same one; on
+    PostgreSQL the candidate is selected FOR UPDATE SKIP LOCKED, so workers
+    don't queue up behind each other's claims.
+    """
+
+    def put(self, payloads: List[Dict[str, Any]]) -> None:
+        if not payloads:
+            return
+        now = datetime.now()
+        with SessionLocal() as db:
+            db.execute(insert(models.ScrapeJob).values([
+                {"payload": json.dumps(p), "status": "queued", "attempts": 0, "enqueued_at": now}
+                for p in payloads
+            ]))
+            db.commit()
+
+    def _claimable(self, now: datetime):
+        job = models.ScrapeJob
+        expired = (job.status == "running") & (job.lease_until < now) & (job.attempts < config.RETRY_MAX_ATTEMPTS)
+        return or_(job.status == "queued", expired)
+
+    def _claim(self) -> Optional[Job]:
+        job = models.ScrapeJob
+        now = datetime.now()
+        with SessionLocal() as db:
+            candidate = db.execute(
+                select(job.id, job.payload)
+                .where(self._claimable(now))
+                .order_by(job.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).first()
+            if candidate is None:
+                return None
+            claimed = db.execute(
+                update(job)
+                .where(job.id == candidate.id, self._claimable(now))
+                .values(
+                    status="running", attempts=job.attempts + 1, worker=worker_name(),
+                    lease_until=now + timedelta(seconds=config.JOB_LEASE_SECONDS),
+                )
+            ).rowcount
+            db.commit()
+        if not claimed:
+            # another worker got there first; try the next job
+            return self._claim()
+        return candidate.id, json.loads(candidate.payload)
+
+    def get(self, timeout: float) -> Optional[Job]:
+        """Claims the next job, waiting up to `timeout` seconds for one."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim()
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(config.JOB_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+
+    def _finish(self, job_id: int, status: str) -> None:
+        with SessionLocal() as db:
+            db.execute(update(models.ScrapeJob).where(models.ScrapeJob.id == job_id).values(status=status, lease_until=None))
+            db.commit()
+
+    def done(self, job: Job) -> None:
+        self._finish(job[0], "done")
+
+    def release(self, job: Job) -> None:
+        """Gives a job that failed back to the queue, or marks it failed after RETRY_MAX_ATTEMPTS claims."""
+        with SessionLocal() as db:
+            attempts = db.execute(select(models.ScrapeJob.attempts).where(models.ScrapeJob.id == job[0])).scalar()
+        self._finish(job[0], "failed" if attempts >= config.RETRY_MAX_ATTEMPTS else "queued")
+
+    def in_flight(self) -> Set[str]:
+        """The URLs of jobs that are queued or running."""
+        with SessionLocal() as db:
+            payloads = db.execute(
+                select(models.ScrapeJob.payload).where(models.ScrapeJob.status.in_(("queued", "running")))
+            ).scalars()
+            return {url for p in payloads for url in json.loads(p)["urls"]}
+
+    def requeue_expired(self) -> None:
+        """
+        Puts running jobs whose lease ran out, i.e. whose worker died, back on
+        the queue, or marks them failed once they used up RETRY_MAX_ATTEMPTS.
+        """
+        job = models.ScrapeJob
+        expired = (job.status == "running") & (job.lease_until < datetime.now())
+        with SessionLocal() as db:
+            db.execute(
+                update(job)
+                .where(expired, job.attempts >= config.RETRY_MAX_ATTEMPTS)
+                .values(status="failed", lease_until=None)
+            )
+            db.execute(update(job).where(expired).values(status="queued", lease_until=None))
+            db.commit()
+
+class RedisQueue:
+    """
+    Jobs in a Redis list. A claimed job moves atomically to a processing list
+    and gets a lease in a sorted set; requeue_expired puts jobs whose lease ran
+    out back on the queue.
+    """
+
+    def __init__(self, client: Any, name: str = "pizza_tracker:jobs"):
+        self.client = client
+        self.queue = name
+        self.processing = name + ":processing"
+        self.leases = name + ":leases"
+
+    def put(self, payloads: List[Dict[str, Any]]) -> None:
+        if payloads:
+            self.client.lpush(self.queue, *[json.dumps(dict(p, attempts=0)) for p in payloads])
+
+    def get(self, timeout: float) -> Optional[Job]:
+        raw = self.client.brpoplpush(self.queue, self.processing, timeout=max(1, int(timeout)))
+        if raw is None:
+            return None
+        self.client.zadd(self.leases, {raw: time.time() + config.JOB_LEASE_SECONDS})
+        return raw, json.loads(raw)
+
+    def _drop(self, raw: Any) -> None:
+        pipe = self.client.pipeline()
+        pipe.lrem(self.processing, 1, raw)
+        pipe.zrem(self.leases, raw)
+        pipe.execute()
+
+    def done(self, job: Job) -> None:
+        self._drop(job[0])
+
+    def release(self, job: Job) -> None:
+        raw, payload = job
+        self._drop(raw)
+        attempts = payload.get("attempts", 0) + 1
+        if attempts < config.RETRY_MAX_ATTEMPTS:
+            self.client.lpush(self.queue, json.dumps(dict(payload, attempts=attempts)))
+        else:
+            print(f"Dropping job after {attempts} attempts: {payload['urls']}")
+
+    def in_flight(self) -> Set[str]:
+        raws = self.client.lrange(self.queue, 0, -1) + self.client.lrange(self.processing, 0, -1)
+        return {url for raw in raws for url in json.loads(raw)["urls"]}
+
+    def requeue_expired(self) -> None:
+        for raw in self.client.zrangebyscore(self.leases, "-inf", time.time()):
+            payload = json.loads(raw)
+            self.release((raw, payload))
+
+_queue = None
+
+def get_queue() -> Optional[Any]:
+    """The configured job queue, or None when scrapes run locally."""
+    global _queue
+    if config.SCRAPE_QUEUE == "local":
+        return None
+    if _queue is None:
+        if config.SCRAPE_QUEUE == "redis":
+            if redis is None:
+                raise RuntimeError("SCRAPE_QUEUE=redis needs the redis package")
+            _queue = RedisQueue(redis.Redis.from_url(config.REDIS_URL))
+        elif config.SCRAPE_QUEUE == "sql":
+            _queue = SqlQueue()
+        else:
+            raise ValueError(f"unknown SCRAPE_QUEUE: {config.SCRAPE_QUEUE}")
+    return _queue
@@ -0,0 +1,121 @@
+# pizza_tracker/src/journal.py
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from . import config, models
+from .database import SessionLocal
+
+def open_round(urls: List[str], now: Optional[datetime] = None) -> Tuple[int, datetime, List[str]]:
+    """
+    Resumes the last unfinished round over the same URLs, or starts a new one.
+    Returns the round id, its scrape time and the URLs still to scrape.
+
+    A round older than the scrape interval is not resumed, so a new round never
+    gets stamped with a stale time. An unfinished round that is not resumed is
+    closed; its URLs are left to the next rounds that include them.
+    """
+    now = now or datetime.now()
+    urls = list(dict.fromkeys(urls))
+    with SessionLocal() as db:
+        last = db.execute(
+            select(models.ScrapeRound)
+            .where(models.ScrapeRound.finished_at.is_(None))
+            .order_by(models.ScrapeRound.id.desc())
+            .limit(1)
+        ).scalar()
+        if last is not None:
+            entries = db.execute(
+                select(models.RoundUrl).where(models.RoundUrl.round_id == last.id)
+            ).scalars().all()
+            fresh = now - last.scrape_time < timedelta(hours=config.SCRAPE_INTERVAL_HOURS)
+            if fresh and {e.url for e in entries} == set(urls):
+                pending = [
+                    e.url for e in entries
+                    if e.status != "done" and e.attempts < config.RETRY_MAX_ATTEMPTS
+                ]
+                print(f"Resuming scrape round {last.id} from {last.scrape_time}, {len(pending)} URLs left.")
+                return last.id, last.scrape_time, pending
+            last.finished_at = now
+
+        scrape_round = models.ScrapeRound(scrape_time=now)
+        db.add(scrape_round)
+        db.flush()
+        if urls:
+            db.execute(insert(models.RoundUrl).values([
+                {"round_id": scrape_round.id, "url": url, "status": "pending", "attempts": 0}
+                for url in urls
+            ]))
+        db.commit()
+        return scrape_round.id, scrape_round.scrape_time, urls
+
+def unfinished_round(now: Optional[datetime] = None) -> Optional[Tuple[int, datetime, List[str]]]:
+    """
+    The last unfinished round, if it started less than the scrape interval ago,
+    with the URLs still to scrape; e.g. a round cut short by a restart.
+    """
+    now = now or datetime.now()
+    with SessionLocal() as db:
+        last = db.execute(
+            select(models.ScrapeRound)
+            .where(models.ScrapeRound.finished_at.is_(None))
+            .order_by(models.ScrapeRound.id.desc())
+            .limit(1)
+        ).scalar()
+        if last is None or now - last.scrape_time >= timedelta(hours=config.SCRAPE_INTERVAL_HOURS):
+            return None
+        pending = db.execute(
+            select(models.RoundUrl.url).where(
+                models.RoundUrl.round_id == last.id,
+                models.RoundUrl.status != "done",
+                models.RoundUrl.attempts < config.RETRY_MAX_ATTEMPTS,
+            )
+        ).scalars().all()
+        return last.id, last.scrape_time, list(pending)
+
+def mark_done(db: Session, round_id: int, urls: List[str]) -> None:
+    """Marks URLs of a round as scraped and saved. Does not commit."""
+    db.execute(
+        update(models.RoundUrl)
+        .where(models.RoundUrl.round_id == round_id, models.RoundUrl.url.in_(urls))
+        .values(status="done", next_try=None, error=None)
+    )
+
+def mark_failed(round_id: int, urls: List[str], error: str, now: Optional[datetime] = None) -> None:
+    """Counts a failed attempt for URLs of a round and schedules their retry with exponential backoff."""
+    now = now or datetime.now()
+    with SessionLocal() as db:
+        entries = db.execute(
+            select(models.RoundUrl).where(models.RoundUrl.round_id == round_id, models.RoundUrl.url.in_(urls))
+        ).scalars().all()
+        for e in entries:
+            e.attempts += 1
+            e.status = "failed"
+            e.error = error
+            e.next_try = now + timedelta(seconds=config.RETRY_BACKOFF_SECONDS * 2 ** (e.attempts - 1))
+        db.commit()
+
+def retryable(round_id: int) -> List[Tuple[str, datetime]]:
+    """The failed URLs of a round that have attempts left, with when to retry them, soonest first."""
+    with SessionLocal() as db:
+        return [tuple(row) for row in db.execute(
+            select(models.RoundUrl.url, models.RoundUrl.next_try)
+            .where(
+                models.RoundUrl.round_id == round_id,
+                models.RoundUrl.status == "failed",
+                models.RoundUrl.attempts < config.RETRY_MAX_ATTEMPTS,
+            )
+            .order_by(models.RoundUrl.next_try)
+        )]
+
+def finish_round(round_id: int) -> None:
+    with SessionLocal() as db:
+        db.execute(
+            update(models.ScrapeRound)
+            .where(models.ScrapeRound.id == round_id)
+            .values(finished_at=datetime.now())
+        )
+        db.commit()
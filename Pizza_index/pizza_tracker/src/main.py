@@ -1,15 +1,19 @@
 # pizza_tracker/src/main.py
 
+import asyncio
 import typer
-from fastapi import FastAPI, Depends
-from fastapi.responses import HTMLResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
 import urllib.parse
 
-from . import scraper, models, scheduler
-from .database import SessionLocal, engine
+from . import scraper, models, scheduler, driver_pool, storage, status, history, export, config, baseline, pizza_index, series, events, jobs
+from .database import SessionLocal, AsyncSessionLocal, async_engine, engine
 
 app = FastAPI()
 
@@ -20,15 +24,32 @@ app.mount("/static", StaticFiles(directory="web/static"), name="static")
 def startup_event():
     # Create database tables on startup
     models.Base.metadata.create_all(bind=engine)
-    scheduler.start_scheduler()
+    # Warm up the baseline model once; after that it is updated on every write
+    with SessionLocal() as db:
+        print(f"Baseline model loaded {baseline.model.load(db)} readings.")
+    scrapes_here = False
+    if config.RUN_SCHEDULER and scheduler.acquire_scheduler_lock():
+        scheduler.start_scheduler()
+        scrapes_here = jobs.get_queue() is None
+    else:
+        print("Scheduler is left to another process.")
+    if not scrapes_here:
+        # Rounds are saved elsewhere; pick them up from the database for /api/events
+        app.state.round_watcher = asyncio.get_running_loop().create_task(events.watch_rounds())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    watcher = getattr(app.state, "round_watcher", None)
+    if watcher is not None:
+        watcher.cancel()
+    # Quit the warm browser sessions so no Chrome processes are left behind
+    driver_pool.close_pool()
+    await async_engine.dispose()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -36,16 +57,133 @@ async def read_root():
         return f.read()
 
 @app.get("/api/status")
-async def get_status(db: Session = Depends(get_db)):
-    latest_data = db.query(models.ScrapeData).order_by(models.ScrapeData.scrape_time.desc()).first()
-    if latest_data and latest_data.popularity_percent_current is not None and latest_data.popularity_percent_normal is not None:
-        if latest_data.popularity_percent_current > latest_data.popularity_percent_normal * 1.5:
-            return {"status": "abnormal", "message": "anomaly detected – danger likely"}
-    return {"status": "nominal", "message": "nominal busyness"}
+async def get_status(db: AsyncSession = Depends(get_async_db)):
+    return await status.get_status(db)
+
+@app.get("/api/events")
+async def get_events(request: Request):
+    """
+    Server-sent events: the current status on connect, then a `reading` event
+    for each new reading and a `status` event whenever a place changes status.
+    """
+    initial = None
+    if events.broadcaster.snapshot is None:
+        async with AsyncSessionLocal() as db:
+            initial = await status.get_status(db)
+
+    async def stream():
+        async for message in events.broadcaster.stream(initial):
+            if await request.is_disconnected():
+                break
+            yield message
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/api/data")
-async def get_data(db: Session = Depends(get_db)):
-    return db.query(models.ScrapeData).all()
+async def get_data(
+    response: Response,
+    place: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    day_of_week: Optional[str] = None,
+    hour: Optional[int] = Query(None, ge=0, le=23),
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    format: str = Query("json", pattern="^(json|ndjson|csv)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Returns per-hour rows, oldest scrape first. JSON responses are paginated:
+    pass the X-Next-Cursor header back as `cursor` to get the next page.
+    The ndjson and csv formats stream every matching row instead.
+    """
+    try:
+        after = history.parse_cursor(cursor)
+        slots = history.slots_for(day_of_week, hour)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stmt = history.select_scrapes(place, start, end, after).execution_options(yield_per=history.YIELD_PER)
+
+    if format != "json":
+        async def stream():
+            # The request's session may be closed before streaming ends, so use our own.
+            async with AsyncSessionLocal() as stream_db:
+                rows = history.iter_rows(await stream_db.stream(stmt), slots, after)
+                lines = history.ndjson_lines(rows) if format == "ndjson" else history.csv_lines(rows)
+                async for chunk in lines:
+                    yield chunk
+        media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+        return StreamingResponse(stream(), media_type=media_type)
+
+    data = []
+    result = await db.stream(stmt)
+    try:
+        async for next_cursor, row in history.iter_rows(result, slots, after):
+            if len(data) == limit:
+                response.headers["X-Next-Cursor"] = last_cursor
+                break
+            data.append(row)
+            last_cursor = next_cursor
+    finally:
+        await result.close()
+    return data
+
+@app.get("/api/index")
+async def get_index(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Returns the pizza index buckets in [start, end), oldest first."""
+    return await pizza_index.get_series(db, start, end)
+
+@app.get("/api/series")
+async def get_series(
+    request: Request,
+    response: Response,
+    place: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("lttb", pattern="^(raw|hour|day|lttb)$"),
+    points: int = Query(500, ge=3, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Returns each place's live readings, with the normal popularity for their
+    hour, averaged per hour or day, or reduced to `points` points with LTTB.
+    Supports conditional requests through ETag and Last-Modified.
+    """
+    params = (place, start, end, resolution, points)
+    version = await series.data_version(db)
+    tag = series.etag(params, version)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if version[1] is not None:
+        # scrape times are stored naive; the scheduler writes them in server time
+        last_modified = version[1].replace(microsecond=0).astimezone(timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    not_modified = False
+    if "if-none-match" in request.headers:
+        not_modified = tag in [t.strip() for t in request.headers["if-none-match"].split(",")]
+    elif "if-modified-since" in request.headers and version[1] is not None:
+        try:
+            not_modified = last_modified <= parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            pass
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return await series.get_series(db, params, version)
+
+@app.get("/api/pool")
+async def get_pool_stats():
+    return driver_pool.get_pool().stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: scrape stage timings, per-place outcomes and DB writes."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 cli_app = typer.Typer()
 
@@ -53,7 +191,36 @@ cli_app = typer.Typer()
 def scrape(url: str):
     """Scrape a single Google Maps URL for popular times."""
     from .scheduler import scrape_url
-    scrape_url(url)
+    try:
+        scrape_url(url)
+    finally:
+        driver_pool.close_pool()
+
+@cli_app.command()
+def migrate_legacy():
+    """Convert rows from the old per-hour scrape_data table into scrapes."""
+    models.Base.metadata.create_all(bind=engine)
+    storage.migrate_legacy_scrape_data()
+
+@cli_app.command()
+def export_parquet(out_dir: str = typer.Option(config.PARQUET_EXPORT_DIR, help="Dataset directory")):
+    """Append scrapes added since the last export to a Parquet dataset."""
+    export.export_parquet(out_dir)
+
+@cli_app.command()
+def rebuild_index():
+    """Recompute every pizza index bucket from the scrape history."""
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        count = storage.rebuild_index_buckets(db)
+        db.commit()
+    print(f"Rebuilt {count} index buckets.")
+
+@cli_app.command()
+def worker():
+    """Run scrape jobs from the queue (SCRAPE_QUEUE=sql or redis) until stopped."""
+    from . import worker as scrape_worker
+    scrape_worker.main()
 
 if __name__ == "__main__":
     cli_app()
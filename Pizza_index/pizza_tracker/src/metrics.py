@@ -0,0 +1,26 @@
+# pizza_tracker/src/metrics.py
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Selenium page loads take seconds; parsing and DB writes take milliseconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# Stages: driver_start, checkout, navigate, wait, page_source, http_fetch, parse, db_write
+STAGE_SECONDS = Histogram(
+    "pizza_scrape_stage_seconds", "Time spent in each stage of the scrape pipeline.",
+    ["stage"], buckets=BUCKETS,
+)
+PLACE_SECONDS = Histogram(
+    "pizza_scrape_place_seconds", "Time to scrape one place, end to end.",
+    ["place"], buckets=BUCKETS,
+)
+# Outcomes: success, no_data, error
+SCRAPES = Counter("pizza_scrapes_total", "Scrapes by place and outcome.", ["place", "outcome"])
+TIMEOUTS = Counter(
+    "pizza_scrape_timeouts_total", "Page loads that timed out waiting for the popular times bars.", ["place"],
+)
+LAST_SUCCESS = Gauge(
+    "pizza_scrape_last_success_timestamp_seconds", "Unix time of the last scrape of a place that found data.", ["place"],
+)
+# Outcomes: success, error
+DB_WRITES = Counter("pizza_db_writes_total", "Scrape round writes by outcome.", ["outcome"])
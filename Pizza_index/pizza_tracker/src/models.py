@@ -1,16 +1,126 @@
 # pizza_tracker/src/models.py
 
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, Float, ForeignKey, Index, LargeBinary, PrimaryKeyConstraint
+from sqlalchemy.orm import relationship
 from .database import Base
+from .curve import WeeklyCurve
 
-class ScrapeData(Base):
-    __tablename__ = "scrape_data"
+class Place(Base):
+    __tablename__ = "places"
 
     id = Column(Integer, primary_key=True, index=True)
-    place = Column(String, index=True)
-    url = Column(String)
-    scrape_time = Column(DateTime)
-    day_of_week = Column(String)
-    hour_of_day = Column(Integer)
-    popularity_percent_normal = Column(Float)
-    popularity_percent_current = Column(Float, nullable=True)
+    name = Column(String, nullable=False)
+    url = Column(String, nullable=False, unique=True)
+
+    scrapes = relationship("Scrape", back_populates="place")
+
+class Scrape(Base):
+    """One scrape of a place: its whole weekly curve plus the live reading, if any."""
+    __tablename__ = "scrapes"
+    __table_args__ = (
+        Index("ix_scrapes_place_id_scrape_time", "place_id", "scrape_time"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    place_id = Column(Integer, ForeignKey("places.id"), nullable=False)
+    scrape_time = Column(DateTime, nullable=False)
+    # 7x24 normal popularity, Sunday 0h first; None where there is no data
+    normal_curve = Column(WeeklyCurve, nullable=False)
+    current_day = Column(SmallInteger, nullable=True)
+    current_hour = Column(SmallInteger, nullable=True)
+    popularity_percent_current = Column(SmallInteger, nullable=True)
+
+    place = relationship("Place", back_populates="scrapes")
+
+class LatestReading(Base):
+    """The most recent scrape of each place, kept up to date on every write."""
+    __tablename__ = "latest_readings"
+
+    place_id = Column(Integer, ForeignKey("places.id"), primary_key=True)
+    scrape_time = Column(DateTime, nullable=False)
+    current_day = Column(SmallInteger, nullable=True)
+    current_hour = Column(SmallInteger, nullable=True)
+    popularity_percent_current = Column(SmallInteger, nullable=True)
+    # normal popularity for the hour of the live reading
+    popularity_percent_normal = Column(SmallInteger, nullable=True)
+    # score of the live reading against the baseline model before it was added
+    baseline_z = Column(Float, nullable=True)
+    baseline_quantile = Column(Float, nullable=True)
+    baseline_samples = Column(Float, nullable=True)
+
+    place = relationship("Place")
+
+class IndexBucket(Base):
+    """The pizza index for one time bucket: the mean current-vs-normal ratio over places."""
+    __tablename__ = "index_buckets"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    value = Column(Float, nullable=False)
+    # number of places with a live reading in the bucket
+    places = Column(Integer, nullable=False)
+
+class BaselineSlot(Base):
+    """
+    The baseline model's statistics for one (place, day, hour), shared by the
+    scrape workers (SCRAPE_QUEUE=sql or redis) and updated with every write.
+    """
+    __tablename__ = "baseline_slots"
+    __table_args__ = (
+        PrimaryKeyConstraint("place_id", "day", "hour"),
+    )
+
+    place_id = Column(Integer, ForeignKey("places.id"), nullable=False)
+    day = Column(SmallInteger, nullable=False)
+    hour = Column(SmallInteger, nullable=False)
+    weight = Column(Float, nullable=False)
+    mean = Column(Float, nullable=False)
+    m2 = Column(Float, nullable=False)
+    # the decayed histogram, float64 bins
+    hist = Column(LargeBinary, nullable=False)
+
+class ScrapeRound(Base):
+    """A scheduler round, journaled so a round cut short can be resumed."""
+    __tablename__ = "scrape_rounds"
+
+    id = Column(Integer, primary_key=True)
+    # every scrape of the round is stamped with this time, resumed or not
+    scrape_time = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    urls = relationship("RoundUrl", back_populates="round")
+
+class RoundUrl(Base):
+    """The progress of one URL in a scrape round."""
+    __tablename__ = "round_urls"
+    __table_args__ = (
+        PrimaryKeyConstraint("round_id", "url"),
+    )
+
+    round_id = Column(Integer, ForeignKey("scrape_rounds.id"), nullable=False)
+    url = Column(String, nullable=False)
+    # pending, done or failed
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    # when a failed URL may be tried again
+    next_try = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
+
+    round = relationship("ScrapeRound", back_populates="urls")
+
+class ScrapeJob(Base):
+    """A batch of URLs waiting for, or claimed by, a scrape worker (SCRAPE_QUEUE=sql)."""
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (
+        Index("ix_scrape_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # JSON: {"urls": [...], "scrape_time": "..."}
+    payload = Column(Text, nullable=False)
+    # queued, running, done or failed
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    enqueued_at = Column(DateTime, nullable=False)
+    # a running job whose lease ran out is given to another worker
+    lease_until = Column(DateTime, nullable=True)
+    worker = Column(String, nullable=True)
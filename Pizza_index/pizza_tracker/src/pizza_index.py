@@ -0,0 +1,109 @@
+# pizza_tracker/src/pizza_index.py
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import config, curve, models
+
+def bucket_start(t: datetime) -> datetime:
+    """Returns the start of the index bucket `t` falls in."""
+    minutes = config.INDEX_BUCKET_MINUTES
+    midnight = t.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = int((t - midnight).total_seconds() // 60)
+    return midnight + timedelta(minutes=elapsed - elapsed % minutes)
+
+def _ratio(normal_curve: List[Optional[int]], day: Optional[int], hour: Optional[int], current: Optional[int]) -> Optional[float]:
+    if day is None or current is None:
+        return None
+    normal = normal_curve[curve.slot(day, hour)]
+    if not normal:
+        return None
+    return current / normal
+
+def compute_buckets(scrapes: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Combines scrapes into index buckets: the mean, over places, of each place's
+    current-vs-normal ratio. A place scraped more than once in a bucket counts
+    with its latest reading. `scrapes` must be ordered by scrape time.
+    """
+    buckets: Dict[datetime, Dict[int, float]] = {}
+    for s in scrapes:
+        ratio = _ratio(s.normal_curve, s.current_day, s.current_hour, s.popularity_percent_current)
+        if ratio is not None:
+            buckets.setdefault(bucket_start(s.scrape_time), {})[s.place_id] = ratio
+    return [
+        {"bucket_start": start, "value": sum(ratios.values()) / len(ratios), "places": len(ratios)}
+        for start, ratios in sorted(buckets.items())
+    ]
+
+def _select_scrapes():
+    return select(
+        models.Scrape.place_id, models.Scrape.scrape_time, models.Scrape.normal_curve,
+        models.Scrape.current_day, models.Scrape.current_hour, models.Scrape.popularity_percent_current,
+    ).order_by(models.Scrape.scrape_time)
+
+def bucket_for(db: Session, scrape_time: datetime) -> Optional[Dict[str, Any]]:
+    """Recomputes the bucket containing `scrape_time` from the scrapes in it."""
+    start = bucket_start(scrape_time)
+    end = start + timedelta(minutes=config.INDEX_BUCKET_MINUTES)
+    stmt = _select_scrapes().where(models.Scrape.scrape_time >= start, models.Scrape.scrape_time < end)
+    buckets = compute_buckets(db.execute(stmt))
+    return buckets[0] if buckets else None
+
+def all_buckets(db: Session) -> List[Dict[str, Any]]:
+    """Recomputes every bucket from the whole history."""
+    return compute_buckets(db.execute(_select_scrapes().execution_options(yield_per=1000)))
+
+class SeriesCache:
+    """
+    Caches index series by requested range. Writes in this process invalidate it;
+    the TTL bounds how stale it can be when another process did the write.
+    """
+
+    def __init__(self, ttl: float = config.INDEX_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[Optional[datetime], Optional[datetime]], Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Optional[datetime], Optional[datetime]]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, key: Tuple[Optional[datetime], Optional[datetime]], series: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), series)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+cache = SeriesCache()
+
+async def get_series(db: AsyncSession, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Returns the materialized index buckets in [start, end), oldest first."""
+    key = (start, end)
+    series = cache.get(key)
+    if series is not None:
+        return series
+
+    stmt = select(models.IndexBucket).order_by(models.IndexBucket.bucket_start)
+    if start is not None:
+        stmt = stmt.where(models.IndexBucket.bucket_start >= start)
+    if end is not None:
+        stmt = stmt.where(models.IndexBucket.bucket_start < end)
+    result = await db.execute(stmt)
+    series = [
+        {"bucket_start": b.bucket_start, "value": b.value, "places": b.places}
+        for b in result.scalars()
+    ]
+    cache.put(key, series)
+    return series
@@ -0,0 +1,148 @@
+# pizza_tracker/src/priority.py
+
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from . import config, curve, models
+
+@dataclass
+class PlaceState:
+    """What the planner knows about a place: its last scrape and what it showed."""
+    url: str
+    last_scrape: Optional[datetime] = None
+    normal_curve: Optional[List[Optional[int]]] = None
+    current: Optional[int] = None
+    normal: Optional[int] = None
+    baseline_z: Optional[float] = None
+    baseline_samples: Optional[float] = None
+
+def load_states(db: Session, urls: List[str]) -> List[PlaceState]:
+    """Reads the latest scrape of each URL in one query; URLs never scraped get an empty state."""
+    latest = models.LatestReading
+    rows = db.execute(
+        select(
+            models.Place.url, latest.scrape_time, models.Scrape.normal_curve,
+            latest.popularity_percent_current, latest.popularity_percent_normal,
+            latest.baseline_z, latest.baseline_samples,
+        )
+        .join(latest, latest.place_id == models.Place.id)
+        .join(models.Scrape, and_(
+            models.Scrape.place_id == latest.place_id, models.Scrape.scrape_time == latest.scrape_time,
+        ))
+        .where(models.Place.url.in_(urls))
+    )
+    known = {row.url: PlaceState(*row) for row in rows}
+    return [known.get(url) or PlaceState(url) for url in urls]
+
+def weight(state: PlaceState, now: datetime) -> float:
+    """
+    How much a place is worth scraping right now, from 0 (closed) to 2: its
+    usual popularity this hour relative to its peak of the day, plus how far
+    its last live reading was from normal.
+    """
+    if state.normal_curve is None:
+        return 1.0
+    day = (now.weekday() + 1) % 7  # Sunday first, like the curves
+    normal = state.normal_curve[curve.slot(day, now.hour)]
+    if not normal:
+        return 0.0
+    peak = max(v or 0 for v in state.normal_curve[curve.slot(day, 0):curve.slot(day + 1, 0)])
+    busyness = normal / peak if peak else 0.0
+
+    deviation = 0.0
+    if state.baseline_z is not None and (state.baseline_samples or 0) >= config.BASELINE_MIN_SAMPLES:
+        deviation = abs(state.baseline_z) / config.BASELINE_Z_THRESHOLD
+    elif state.current is not None and state.normal:
+        deviation = abs(state.current / state.normal - 1) / (config.ANOMALY_RATIO - 1)
+    return busyness + min(deviation, 1.0)
+
+def priority(state: PlaceState, now: datetime) -> float:
+    """Hours since the last scrape, scaled by the place's weight. Never scraped places come first."""
+    if state.last_scrape is None:
+        return math.inf
+    return (now - state.last_scrape).total_seconds() / 3600 * weight(state, now)
+
+class Planner:
+    """
+    Picks the places to scrape on each tick of the scheduler.
+
+    Scrapes are paid for from a token bucket that fills at SCRAPE_BUDGET_PER_HOUR
+    and holds at most an hour's worth, so the browsers are never asked for more
+    than the budget. Tokens go to the places with the highest priority that were
+    not scraped in the last PLACE_MIN_INTERVAL_MINUTES; a place that has not been
+    scraped for SCRAPE_INTERVAL_HOURS is due no matter its weight, so closed
+    places still get their curves refreshed.
+
+    A pick whose scrape has not shown up by the next plan counts as a failure.
+    A failing place waits PLACE_MIN_INTERVAL_MINUTES after its last attempt,
+    twice as long after two failures in a row, and so on, up to
+    SCRAPE_INTERVAL_HOURS, so a dead URL doesn't take a token on every tick.
+    """
+
+    def __init__(self, budget_per_hour: float = config.SCRAPE_BUDGET_PER_HOUR):
+        self.budget_per_hour = budget_per_hour
+        self.tokens = budget_per_hour
+        self._last_tick: Optional[datetime] = None
+        # url -> (last attempt, failures in a row before it)
+        self._attempts: Dict[str, Tuple[datetime, int]] = {}
+        self._lock = threading.Lock()
+
+    def _failures(self, state: PlaceState) -> Tuple[Optional[datetime], int]:
+        """The last attempt at a place and its failures in a row, counting that attempt."""
+        attempt = self._attempts.get(state.url)
+        if attempt is None:
+            return None, 0
+        attempted_at, failures = attempt
+        if state.last_scrape is not None and state.last_scrape >= attempted_at:
+            del self._attempts[state.url]
+            return None, 0
+        return attempted_at, failures + 1
+
+    def _backing_off(self, state: PlaceState, now: datetime) -> bool:
+        attempted_at, failures = self._failures(state)
+        if not failures:
+            return False
+        minutes = min(config.PLACE_MIN_INTERVAL_MINUTES * 2 ** (failures - 1), config.SCRAPE_INTERVAL_HOURS * 60)
+        return now < attempted_at + timedelta(minutes=minutes)
+
+    def _refill(self, now: datetime) -> None:
+        if self._last_tick is not None:
+            hours = (now - self._last_tick).total_seconds() / 3600
+            self.tokens = min(self.budget_per_hour, self.tokens + hours * self.budget_per_hour)
+        self._last_tick = now
+
+    def plan(self, states: List[PlaceState], now: datetime) -> List[str]:
+        """Returns the URLs to scrape now, most urgent first, and spends their tokens."""
+        with self._lock:
+            self._refill(now)
+            candidates = []
+            for state in states:
+                if self._backing_off(state, now):
+                    continue
+                if state.last_scrape is not None:
+                    hours = (now - state.last_scrape).total_seconds() / 3600
+                    if hours * 60 < config.PLACE_MIN_INTERVAL_MINUTES:
+                        continue
+                    due = hours >= config.SCRAPE_INTERVAL_HOURS
+                    score = priority(state, now)
+                    if score <= 0 and not due:
+                        continue
+                    candidates.append((due, score, state.url))
+                else:
+                    candidates.append((True, math.inf, state.url))
+
+            candidates.sort(key=lambda c: (c[0], c[1]), reverse=True)
+            picked = [url for _, _, url in candidates[:int(self.tokens)]]
+            self.tokens -= len(picked)
+            failing = {state.url: self._failures(state)[1] for state in states}
+            for url in picked:
+                self._attempts[url] = (now, failing.get(url, 0))
+            return picked
+
+planner = Planner()
@@ -0,0 +1,108 @@
+# pizza_tracker/src/readiness.py
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from . import config
+
+BAR_CLASS = 'section-popular-times-bar'
+
+# Outcomes of waiting for a page
+BARS = "bars"
+NO_DATA = "no_data"
+TIMEOUT = "timeout"
+
+# One round trip per poll: are the bars there, and has the place panel rendered?
+_STATE_SCRIPT = """
+return [
+    document.getElementsByClassName(arguments[0]).length > 0,
+    document.querySelector('[role="main"] h1') !== null,
+];
+"""
+
+POLL_SECONDS = 0.25
+
+class PageState:
+    """
+    WebDriverWait condition that is met as soon as the popular times bars are
+    in the page, or once the place panel has been rendered for `grace` seconds
+    without them, which is the layout of a place that has no popular times.
+    """
+
+    def __init__(self, grace: float = config.READY_NO_DATA_GRACE, clock: Callable[[], float] = time.monotonic):
+        self.grace = grace
+        self._clock = clock
+        self._panel_seen = None
+
+    def __call__(self, driver: Any) -> Any:
+        bars, panel = driver.execute_script(_STATE_SCRIPT, BAR_CLASS)
+        if bars:
+            return BARS
+        if panel:
+            now = self._clock()
+            if self._panel_seen is None:
+                self._panel_seen = now
+            elif now - self._panel_seen >= self.grace:
+                return NO_DATA
+        return False
+
+class LoadTimes:
+    """
+    Remembers how long the bars of each place took to render and derives the
+    place's timeout from the p95 of its recent load times.
+    """
+
+    def __init__(
+        self,
+        window: int = config.READY_WINDOW,
+        min_samples: int = config.READY_MIN_SAMPLES,
+        margin: float = config.READY_TIMEOUT_MARGIN,
+        minimum: float = config.READY_TIMEOUT_MIN,
+        maximum: float = config.READY_TIMEOUT_MAX,
+    ):
+        self.window = window
+        self.min_samples = min_samples
+        self.margin = margin
+        self.minimum = minimum
+        self.maximum = maximum
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, place: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(place, deque(maxlen=self.window)).append(seconds)
+
+    def timeout(self, place: str) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(place, ()))
+        if len(samples) < self.min_samples:
+            return self.maximum
+        p95 = samples[math.ceil(0.95 * len(samples)) - 1]
+        return min(max(p95 * self.margin, self.minimum), self.maximum)
+
+# Process-wide load times, shared by all browser sessions
+load_times = LoadTimes()
+
+def wait_ready(driver: Any, place: str, times: LoadTimes = None) -> str:
+    """
+    Waits until the page shows popular times (BARS), shows a place without
+    them (NO_DATA), or the place's learned timeout runs out (TIMEOUT).
+    """
+    times = times or load_times
+    timeout = times.timeout(place)
+    started = time.monotonic()
+    try:
+        state = WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(PageState())
+    except TimeoutException:
+        # The page may just have become slower; widen the place's timeout a bit.
+        times.record(place, min(timeout * times.margin, times.maximum))
+        return TIMEOUT
+    if state == BARS:
+        times.record(place, time.monotonic() - started)
+    return state
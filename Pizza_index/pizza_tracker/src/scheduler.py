@@ -1,10 +1,20 @@
 # pizza_tracker/src/scheduler.py
 
 from apscheduler.schedulers.background import BackgroundScheduler
-from . import scraper
-from .database import SessionLocal
+from sqlalchemy import text
+from . import config, events, export, jobs, journal, priority, storage
+from .database import SessionLocal, engine
+from .executor import ScrapeExecutor
 from datetime import datetime
-import urllib.parse
+from typing import Any, Dict, List, Optional
+import time
+try:
+    import fcntl
+except ImportError:  # not on Windows, where the file lock is skipped
+    fcntl = None
+
+# Key of the PostgreSQL advisory lock held by the process running the scheduler
+SCHEDULER_LOCK_KEY = 0x70697a7a
 
 # URLs from instructions.txt
 URLS_TO_SCRAPE = [
@@ -16,53 +26,188 @@ URLS_TO_SCRAPE = [
     "https://www.google.com/maps/search/?api=1&query=Freddie%27s+Beach+Bar+555+23rd+St+S+Arlington+VA+22202",
 ]
 
+class Checkpoint:
+    """
+    Collects the results of a round as they come in and saves them every
+    `every` URLs, so a round that dies only loses the URLs since the last save.
+    URLs without data, or whose save failed, are journaled as failed.
+    """
+
+    def __init__(self, round_id: int, scrape_time: datetime, every: int = config.ROUND_CHECKPOINT_EVERY):
+        self.round_id = round_id
+        self.scrape_time = scrape_time
+        self.every = max(1, every)
+        self.saved = 0
+        self._results: List[Dict[str, Any]] = []
+
+    def add(self, url: str, data: Optional[List[Dict[str, Any]]]) -> None:
+        if not data:
+            journal.mark_failed(self.round_id, [url], "no data")
+            return
+        self._results.append({"url": url, "data": data})
+        if len(self._results) >= self.every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._results:
+            return
+        if storage.save_round(self._results, self.scrape_time, self.round_id):
+            self.saved += len(self._results)
+        else:
+            journal.mark_failed(self.round_id, [r["url"] for r in self._results], "database write failed")
+        self._results = []
+
+def _scrape(round_id: int, scrape_time: datetime, urls: List[str]) -> int:
+    checkpoint = Checkpoint(round_id, scrape_time)
+    ScrapeExecutor().run_round(urls, on_result=checkpoint.add)
+    checkpoint.flush()
+    return checkpoint.saved
+
+def scrape_round(urls: Optional[List[str]] = None, retry: bool = True) -> None:
+    """
+    Scrapes a batch of URLs concurrently and saves them under one scrape time.
+    The round is journaled: if it was cut short, the next call picks it up
+    where it stopped, and, with `retry`, failed URLs are retried with backoff.
+    """
+    urls = URLS_TO_SCRAPE if urls is None else urls
+    _run_round(*journal.open_round(urls), retry=retry)
+
+def resume_round(retry: bool = True) -> bool:
+    """
+    Finishes the last round if it was cut short less than SCRAPE_INTERVAL_HOURS
+    ago, under its own scrape time. Returns True if there was one.
+    """
+    unfinished = journal.unfinished_round()
+    if unfinished is None:
+        return False
+    round_id, scrape_time, pending = unfinished
+    print(f"Resuming scrape round {round_id} from {scrape_time}, {len(pending)} URLs left.")
+    _run_round(round_id, scrape_time, pending, retry=retry)
+    return True
+
+def _run_round(round_id: int, scrape_time: datetime, pending: List[str], retry: bool) -> None:
+    saved = _scrape(round_id, scrape_time, pending)
+
+    while retry:
+        failed = journal.retryable(round_id)
+        if not failed:
+            break
+        # Wait for the soonest retry, then take every URL that is due by then
+        due = max(datetime.now(), failed[0][1])
+        delay = (due - datetime.now()).total_seconds()
+        if delay > 0:
+            time.sleep(delay)
+        saved += _scrape(round_id, scrape_time, [url for url, next_try in failed if next_try <= due])
+    journal.finish_round(round_id)
+
+    if not saved:
+        print("No data scraped in this round.")
+        return
+    events.publish_round(scrape_time)
+
 def scrape_url(url: str):
     """Scrape a single Google Maps URL for popular times."""
-    print(f"Scraping {url}...")
-    scraped_data = scraper.get_popular_times(url)
-    
-    if not scraped_data:
-        print("No data scraped.")
+    scrape_round([url])
+
+def dispatch(urls: List[str], retry: bool = True) -> None:
+    """
+    Scrapes URLs as one round: here, or, with a job queue configured, by
+    queueing jobs for the workers under a common scrape time.
+    """
+    queue = jobs.get_queue()
+    if queue is None:
+        scrape_round(urls, retry)
         return
+    queue.requeue_expired()
+    payloads = jobs.make_jobs(urls, datetime.now())
+    queue.put(payloads)
+    print(f"Queued {len(payloads)} jobs for {len(urls)} URLs.")
 
-    # Extract place name from URL
-    try:
-        place_name = urllib.parse.unquote(url.split('query=')[1].split('&')[0])
-    except IndexError:
-        place_name = "Unknown"
-
-    # Import models here to avoid circular imports
-    from . import models
-    
-    db = SessionLocal()
-    try:
-        for item in scraped_data:
-            db_item = models.ScrapeData(
-                place=place_name,
-                url=url,
-                scrape_time=datetime.now(),
-                day_of_week=item['day_of_week'],
-                hour_of_day=item['hour_of_day'],
-                popularity_percent_normal=item['popularity_percent_normal'],
-                popularity_percent_current=item.get('popularity_percent_current')
-            )
-            db.add(db_item)
-        db.commit()
-        print(f"Successfully saved {len(scraped_data)} records for '{place_name}' to the database.")
-    except Exception as e:
-        print(f"Error saving to database: {e}")
-        db.rollback()
-    finally:
-        db.close()
+def scrape_all() -> None:
+    dispatch(URLS_TO_SCRAPE)
+
+def priority_tick(now: Optional[datetime] = None) -> None:
+    """Scrapes, as one round, the places the planner picks for this tick."""
+    now = now or datetime.now()
+    urls = URLS_TO_SCRAPE
+    queue = jobs.get_queue()
+    if queue is None and resume_round(retry=False):
+        # The places of a round cut short by a restart come first
+        return
+    if queue is not None:
+        # Places still waiting for a worker are not queued twice
+        queue.requeue_expired()
+        in_flight = queue.in_flight()
+        urls = [url for url in urls if url not in in_flight]
+    with SessionLocal() as db:
+        states = priority.load_states(db, urls)
+    picked = priority.planner.plan(states, now)
+    if picked:
+        print(f"Scraping {len(picked)} of {len(URLS_TO_SCRAPE)} places this tick.")
+        # No retries within the round: each pick is one scrape of the budget,
+        # and the planner backs off from places that keep failing.
+        dispatch(picked, retry=False)
 
 def schedule_scraping_jobs(scheduler: BackgroundScheduler):
-    """Adds scraping jobs to the scheduler for each URL."""
-    for url in URLS_TO_SCRAPE:
-        # Schedule each job to run at a specified interval, e.g., every hour.
-        # For demonstration, this is set to a long interval.
-        # In a real application, this might be every hour or so.
-        scheduler.add_job(scrape_url, 'interval', hours=24, args=[url], id=f"scrape_{url}", replace_existing=True)
-        print(f"Scheduled scraping job for {url}")
+    """
+    Adds the scrape job to the scheduler: a priority tick in adaptive mode, or a
+    round of all URLs together in fixed mode.
+    """
+    # A round that is still running when the next one is due is not started twice.
+    if config.SCHEDULER_MODE == "adaptive":
+        scheduler.add_job(
+            priority_tick, 'interval', minutes=config.SCHEDULER_TICK_MINUTES, next_run_time=datetime.now(),
+            id="scrape_round", replace_existing=True, max_instances=1, coalesce=True,
+        )
+        print(f"Scheduled adaptive scraping of {len(URLS_TO_SCRAPE)} URLs, {config.SCRAPE_BUDGET_PER_HOUR} scrapes per hour at most")
+    else:
+        scheduler.add_job(
+            scrape_all, 'interval', hours=config.SCRAPE_INTERVAL_HOURS,
+            id="scrape_round", replace_existing=True, max_instances=1, coalesce=True,
+        )
+        print(f"Scheduled scrape round for {len(URLS_TO_SCRAPE)} URLs every {config.SCRAPE_INTERVAL_HOURS} hours")
+        if jobs.get_queue() is None:
+            # The first round is an interval away; a round cut short by a restart is finished now.
+            scheduler.add_job(resume_round, id="resume_round", replace_existing=True)
+
+    if config.PARQUET_EXPORT_INTERVAL_HOURS > 0:
+        scheduler.add_job(
+            export.export_parquet, 'interval', hours=config.PARQUET_EXPORT_INTERVAL_HOURS,
+            id="export_parquet", replace_existing=True, max_instances=1, coalesce=True,
+        )
+        print(f"Scheduled Parquet export to {config.PARQUET_EXPORT_DIR} every {config.PARQUET_EXPORT_INTERVAL_HOURS} hours")
+
+_lock_holder = None
+
+def acquire_scheduler_lock() -> bool:
+    """
+    Returns True if this process may run the scheduler: it holds a session
+    advisory lock on PostgreSQL, or a file lock otherwise, until it exits.
+    Other API processes (e.g. more uvicorn workers) get False.
+    """
+    global _lock_holder
+    if _lock_holder is not None:
+        return True
+    if engine.dialect.name == "postgresql":
+        conn = engine.connect()
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}).scalar()
+        # The lock belongs to the session, not the transaction; don't sit idle in one.
+        conn.commit()
+        if not locked:
+            conn.close()
+            return False
+        _lock_holder = conn
+        return True
+    if fcntl is None:
+        return True
+    f = open(config.SCHEDULER_LOCK_FILE, "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _lock_holder = f
+    return True
 
 def start_scheduler():
     """Initializes and starts the scheduler."""
@@ -1,90 +1,226 @@
 # pizza_tracker/src/scraper.py
 
+import html as html_lib
 import os
+import re
+import time
 import urllib.parse
 from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service as ChromeService
 from bs4 import BeautifulSoup
+try:
+    from lxml import html as lxml_html
+except ImportError:  # optional, BeautifulSoup is used instead
+    lxml_html = None
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-from . import config
+from . import config, driver_pool, http_fetch, metrics, readiness
 
 # gmaps starts their weeks on sunday
 days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
 
-def get_popular_times(url: str) -> List[Dict[str, Any]]:
+def place_name_from_url(url: str) -> str:
+    """Extracts the place name from the query of a Google Maps search URL."""
+    try:
+        return urllib.parse.unquote(url.split('query=')[1].split('&')[0])
+    except IndexError:
+        return "Unknown"
+
+def backend_for(url: str) -> str:
+    """Returns the fetch backend configured for the place behind `url`."""
+    return config.FETCH_BACKEND_BY_PLACE.get(place_name_from_url(url), config.FETCH_BACKEND)
+
+def get_popular_times_http(url: str) -> List[Dict[str, Any]]:
+    """
+    Scrapes the popular times data over plain HTTP: from the rendered bars if the
+    page has them, otherwise from the data embedded in the page.
+    """
+    html = http_fetch.fetch_html(url)
+    if not html:
+        return []
+    return parse_html(html) or http_fetch.parse_payload(html)
+
+def get_popular_times(url: str, backend: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Scrapes the popular times data for a given Google Maps URL.
+
+    `backend` is "selenium" (render the page in Chrome), "http" (plain HTTP only)
+    or "auto" (plain HTTP, falling back to Chrome when that finds nothing).
+    Defaults to the backend configured for the place.
     """
+    backend = backend or backend_for(url)
+    if backend in ("http", "auto"):
+        data = get_popular_times_http(url)
+        if data or backend == "http":
+            return data
+        print(f"No data over HTTP, falling back to Selenium for url: {url}")
+
     html = get_html(url)
     if html:
         return parse_html(html)
     return []
 
-def get_html(u: str) -> Optional[str]:
+@metrics.STAGE_SECONDS.labels('driver_start').time()
+def create_driver() -> webdriver.Chrome:
     """
-    Gets the HTML source of a Google Maps page.
+    Starts a new headless Chrome session, with the configured browser profile.
+    """
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--lang=de-DE') # Use German for 24h time format
+    if config.CHROME_BINARY_LOCATION:
+        options.binary_location = config.CHROME_BINARY_LOCATION
+    if config.BROWSER_PROFILE == 'light':
+        for arg in light_profile_args():
+            options.add_argument(arg)
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    # The path to chromedriver can be set in the system's PATH or specified here.
+    # If CHROMEDRIVER_BINARY_LOCATION is not set, Selenium will try to find it in PATH.
+    if config.CHROMEDRIVER_BINARY_LOCATION:
+        d = webdriver.Chrome(service=ChromeService(config.CHROMEDRIVER_BINARY_LOCATION), options=options)
+    else:
+        # This relies on chromedriver being in the system's PATH
+        d = webdriver.Chrome(options=options)
+
+    if config.BROWSER_PROFILE == 'light':
+        block_resources(d)
+    return d
+
+def light_profile_args() -> List[str]:
+    """Chrome flags of the light profile: only what is needed to render the DOM."""
+    return [
+        '--disable-gpu',
+        '--disable-extensions',
+        '--disable-dev-shm-usage',
+        '--disable-background-networking',
+        '--disable-component-update',
+        '--mute-audio',
+        '--blink-settings=imagesEnabled=false',
+        f'--js-flags=--max-old-space-size={config.BROWSER_MAX_HEAP_MB}',
+    ]
+
+def block_resources(d: webdriver.Chrome) -> None:
+    """
+    Makes the session drop requests for images, map tiles, fonts and media
+    through the DevTools protocol; the popular times labels don't need them.
     """
     try:
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--lang=de-DE') # Use German for 24h time format
-        if config.CHROME_BINARY_LOCATION:
-            options.binary_location = config.CHROME_BINARY_LOCATION
-        
-        # The path to chromedriver can be set in the system's PATH or specified here.
-        # If CHROMEDRIVER_BINARY_LOCATION is not set, Selenium will try to find it in PATH.
-        if config.CHROMEDRIVER_BINARY_LOCATION:
-            d = webdriver.Chrome(service=ChromeService(config.CHROMEDRIVER_BINARY_LOCATION), options=options)
-        else:
-            # This relies on chromedriver being in the system's PATH
-            d = webdriver.Chrome(options=options)
-
-
-        d.get(u)
-
-        # Wait for the popular times bars to be present
-        WebDriverWait(d, 30).until(
-            EC.presence_of_element_located((By.CLASS_NAME, 'section-popular-times-bar'))
-        )
-
-        html = d.page_source
-        d.quit()
-        return html
-
-    except TimeoutException:
-        print(f'ERROR: Timeout! (This could be due to missing "popular times" data, or not enough waiting.) for url: {u}')
-        return None
+        d.execute_cdp_cmd('Network.enable', {})
+        d.execute_cdp_cmd('Network.setBlockedURLs', {'urls': config.BROWSER_BLOCKED_URLS})
     except Exception as e:
-        print(f"An error occurred in get_html: {e}")
-        if 'd' in locals():
-            d.quit()
-        return None
-
+        # Still usable, just slower
+        print(f"Could not block resources in the browser: {e}")
 
-def parse_html(html: str) -> List[Dict[str, Any]]:
+def get_html(u: str) -> Optional[str]:
     """
-    Parses the HTML to extract popular times data.
+    Gets the HTML source of a Google Maps page, using a session from the driver pool.
+    Returns None if the page has no popular times; driver and navigation errors
+    are raised, so they are counted as errors rather than as places without data.
+    """
+    started = time.monotonic()
+    # The pool discards a session that raises.
+    with driver_pool.get_pool().driver() as d:
+        metrics.STAGE_SECONDS.labels('checkout').observe(time.monotonic() - started)
+        with metrics.STAGE_SECONDS.labels('navigate').time():
+            d.get(u)
+
+        # Wait for the popular times bars, for as long as this place usually needs
+        place = place_name_from_url(u)
+        with metrics.STAGE_SECONDS.labels('wait').time():
+            state = readiness.wait_ready(d, place)
+        # Either way the session itself is fine, so it goes back to the pool.
+        if state == readiness.NO_DATA:
+            print(f"No popular times on the page for url: {u}")
+            return None
+        if state == readiness.TIMEOUT:
+            metrics.TIMEOUTS.labels(place).inc()
+            print(f'ERROR: Timeout! (This could be due to missing "popular times" data, or not enough waiting.) for url: {u}')
+            return None
+
+        with metrics.STAGE_SECONDS.labels('page_source').time():
+            return d.page_source
+
+
+_BAR_CLASS = readiness.BAR_CLASS
+# A <div> start tag; quoted attribute values may contain '>'
+_DIV_TAG_RE = re.compile(r'<div\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.IGNORECASE)
+_ATTR_RE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+# Newer German labels, e.g. "Normalerweise 20 % Betrieb um 10 Uhr"
+_USUAL_LABEL_RE = re.compile(r'Normalerweise (\d+)\s*% Betrieb um (\d+) Uhr')
+
+def _tag_attrs(attr_text: str) -> Dict[str, str]:
+    attrs = {}
+    for m in _ATTR_RE.finditer(attr_text):
+        value = next((v for v in m.group(2, 3, 4) if v is not None), '')
+        attrs[m.group(1).lower()] = html_lib.unescape(value)
+    return attrs
+
+def _bar_labels_fast(html: str) -> List[str]:
     """
+    Finds the bar labels by scanning for the class name and tokenizing only the
+    tags around it, without parsing the rest of the page.
+    """
+    labels = []
+    pos = html.find(_BAR_CLASS)
+    while pos != -1:
+        start = html.rfind('<', 0, pos)
+        m = _DIV_TAG_RE.match(html, start) if start != -1 else None
+        if m is None or m.end() <= pos:
+            # Not inside a <div> tag, e.g. a stylesheet or script mentioning the class
+            pos = html.find(_BAR_CLASS, pos + len(_BAR_CLASS))
+            continue
+        attrs = _tag_attrs(m.group(1))
+        if _BAR_CLASS in attrs.get('class', '').split() and 'aria-label' in attrs:
+            labels.append(attrs['aria-label'])
+        pos = html.find(_BAR_CLASS, m.end())
+    return labels
+
+def _bar_labels_lxml(html: str) -> List[str]:
+    tree = lxml_html.fromstring(html)
+    return tree.xpath(
+        "//div[contains(concat(' ', normalize-space(@class), ' '), ' %s ')]/@aria-label" % _BAR_CLASS
+    )
+
+def _bar_labels_bs4(html: str) -> List[str]:
     soup = BeautifulSoup(html, features='html.parser')
-    pops = soup.find_all('div', {'class': 'section-popular-times-bar'})
+    pops = soup.find_all('div', {'class': _BAR_CLASS})
+    return [pop['aria-label'] for pop in pops if pop.has_attr('aria-label')]
 
+def bar_labels(html: str, backend: Optional[str] = None) -> List[str]:
+    """
+    Returns the aria-labels of the popular times bars, in page order.
+
+    `backend` is "fast" (tag scanner), "lxml" or "bs4" (BeautifulSoup); it
+    defaults to config.PARSER_BACKEND. lxml falls back to bs4 if not installed.
+    """
+    backend = backend or config.PARSER_BACKEND
+    if backend == 'fast':
+        return _bar_labels_fast(html)
+    if backend == 'lxml' and lxml_html is not None:
+        return _bar_labels_lxml(html)
+    return _bar_labels_bs4(html)
+
+@metrics.STAGE_SECONDS.labels('parse').time()
+def parse_html(html: str, backend: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Parses the HTML to extract popular times data.
+    """
     data = []
     dow = 0
     hour = 0
 
-    for pop in pops:
-        t = pop['aria-label']
+    for t in bar_labels(html, backend):
         hour_prev = hour
         freq_now = None
 
         try:
-            if 'normal' not in t:
+            usual = _USUAL_LABEL_RE.search(t)
+            if usual:
+                freq = int(usual.group(1))
+                hour = int(usual.group(2))
+            elif 'normal' not in t:
                 hour = int(t.split()[1])
                 freq = int(t.split()[4])
             else:
@@ -0,0 +1,152 @@
+# pizza_tracker/src/series.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import curve, history, models
+
+RESOLUTIONS = ("raw", "hour", "day", "lttb")
+
+# Downsampled series kept in memory, keyed by request and data version.
+CACHE_SIZE = 64
+
+# (number of scrapes, newest scrape id), and the newest scrape time
+Version = Tuple[Tuple[int, int], Optional[datetime]]
+
+async def data_version(db: AsyncSession) -> Version:
+    """
+    Returns what identifies the scrapes written so far, and the newest scrape
+    time. The count changes with every commit, including a worker's batch that
+    commits after one with a higher id.
+    """
+    result = await db.execute(select(
+        func.count(models.Scrape.id), func.max(models.Scrape.id), func.max(models.Scrape.scrape_time),
+    ))
+    count, last_id, last_time = result.one()
+    return (count, last_id or 0), last_time
+
+def etag(params: Tuple[Any, ...], version: Version) -> str:
+    digest = hashlib.sha1(repr((params, version[0])).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def bucket_means(t: np.ndarray, values: List[np.ndarray], unit: str) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Averages each value array over calendar buckets of `unit` ("h" or "D"),
+    ignoring NaNs. Returns the bucket starts and the per-bucket means.
+    """
+    buckets, inverse = np.unique(t.astype(f"datetime64[{unit}]"), return_inverse=True)
+    means = []
+    for v in values:
+        present = ~np.isnan(v)
+        sums = np.bincount(inverse, weights=np.where(present, v, 0.0), minlength=len(buckets))
+        counts = np.bincount(inverse, weights=present, minlength=len(buckets))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means.append(sums / counts)
+    return buckets.astype("datetime64[s]"), means
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `points` indices of (x, y) that keep
+    the visual shape of the line. Always keeps the first and last point.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    picked = np.empty(points, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket, or the last point for the final bucket
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        ax, ay = x[picked[i]], y[picked[i]]
+        bx, by = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((ax - bx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (by - ay))
+        picked[i + 1] = lo + int(np.argmax(area))
+    return picked
+
+def downsample(t: np.ndarray, current: np.ndarray, normal: np.ndarray, resolution: str, points: int) -> Dict[str, List[Any]]:
+    if resolution in ("hour", "day"):
+        t, (current, normal) = bucket_means(t, [current, normal], "h" if resolution == "hour" else "D")
+    elif resolution == "lttb":
+        idx = lttb(t.astype("int64").astype(float), current, points)
+        t, current, normal = t[idx], current[idx], normal[idx]
+    return {
+        "t": [str(v) for v in t],
+        "current": [None if np.isnan(v) else round(float(v), 1) for v in current],
+        "normal": [None if np.isnan(v) else round(float(v), 1) for v in normal],
+    }
+
+async def _load(db: AsyncSession, place: Optional[str], start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Tuple[list, list, list]]:
+    stmt = (
+        history.select_scrapes(place, start, end)
+        .where(models.Scrape.popularity_percent_current.is_not(None))
+        .execution_options(yield_per=history.YIELD_PER)
+    )
+    places: Dict[str, Tuple[list, list, list]] = {}
+    result = await db.stream(stmt)
+    try:
+        async for s in result:
+            t, current, normal = places.setdefault(s.name, ([], [], []))
+            t.append(s.scrape_time)
+            current.append(s.popularity_percent_current)
+            value = s.normal_curve[curve.slot(s.current_day, s.current_hour)]
+            normal.append(np.nan if value is None else value)
+    finally:
+        await result.close()
+    return places
+
+class _Cache:
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: "OrderedDict[Any, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def put(self, key: Any, value: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+cache = _Cache(CACHE_SIZE)
+
+async def get_series(
+    db: AsyncSession,
+    params: Tuple[Optional[str], Optional[datetime], Optional[datetime], str, int],
+    version: Version,
+) -> List[Dict[str, Any]]:
+    """
+    Returns one downsampled series of live readings, with the normal popularity
+    of each reading's hour, per place. `params` is (place, start, end,
+    resolution, points); results are cached until `version` changes.
+    """
+    key = (params, version[0])
+    series = cache.get(key)
+    if series is not None:
+        return series
+
+    place, start, end, resolution, points = params
+    series = []
+    for name, (t, current, normal) in sorted((await _load(db, place, start, end)).items()):
+        series.append({"place": name, **downsample(
+            np.array(t, dtype="datetime64[s]"),
+            np.array(current, dtype=float),
+            np.array(normal, dtype=float),
+            resolution, points,
+        )})
+    cache.put(key, series)
+    return series
@@ -0,0 +1,67 @@
+# pizza_tracker/src/status.py
+
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from . import config, models
+
+ABNORMAL = {"status": "abnormal", "message": "anomaly detected – danger likely"}
+NOMINAL = {"status": "nominal", "message": "nominal busyness"}
+
+def evaluate_reading(reading: models.LatestReading) -> Dict[str, Any]:
+    """
+    Judges a place's live popularity against the baseline model's score for that
+    hour, or against Google's usual popularity while the model has too few readings.
+    """
+    current = reading.popularity_percent_current
+    normal = reading.popularity_percent_normal
+    ratio = None
+    status = "unknown"
+    if current is not None and normal is not None:
+        ratio = current / normal if normal else None
+    if (
+        reading.baseline_z is not None
+        and reading.baseline_samples is not None
+        and reading.baseline_samples >= config.BASELINE_MIN_SAMPLES
+    ):
+        # Enough history for this hour: compare against what we have observed
+        abnormal = reading.baseline_z >= config.BASELINE_Z_THRESHOLD
+        status = "abnormal" if abnormal else "nominal"
+    elif current is not None and normal is not None:
+        # Otherwise fall back to Google's usual popularity for the hour
+        abnormal = current > normal * config.ANOMALY_RATIO
+        status = "abnormal" if abnormal else "nominal"
+    return {
+        "place": reading.place.name,
+        "scrape_time": reading.scrape_time,
+        "popularity_percent_current": current,
+        "popularity_percent_normal": normal,
+        "ratio": ratio,
+        "baseline_z": reading.baseline_z,
+        "baseline_quantile": reading.baseline_quantile,
+        "baseline_samples": reading.baseline_samples,
+        "status": status,
+    }
+
+def _select_readings():
+    return select(models.LatestReading).options(joinedload(models.LatestReading.place))
+
+def summarize(readings: List[models.LatestReading]) -> Dict[str, Any]:
+    """
+    Evaluates the latest reading of every place. The overall status is abnormal
+    if any place is.
+    """
+    places = [evaluate_reading(r) for r in readings]
+    overall = ABNORMAL if any(p["status"] == "abnormal" for p in places) else NOMINAL
+    return {**overall, "places": places}
+
+async def get_status(db: AsyncSession) -> Dict[str, Any]:
+    result = await db.execute(_select_readings())
+    return summarize(result.scalars().all())
+
+def read_status(db: Session) -> Dict[str, Any]:
+    """Same as get_status, for the scheduler's threads."""
+    return summarize(db.execute(_select_readings()).scalars().all())
@@ -0,0 +1,366 @@
+# pizza_tracker/src/storage.py
+
+import csv
+import io
+import itertools
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, func, inspect, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import baseline, config, curve, journal, metrics, models, pizza_index, scraper
+from .database import SessionLocal, engine
+
+SCRAPE_COLUMNS = (
+    'place_id', 'scrape_time', 'normal_curve',
+    'current_day', 'current_hour', 'popularity_percent_current',
+)
+
+def ensure_places(db: Session, places: List[Tuple[str, str]]) -> Dict[str, int]:
+    """
+    Returns a url -> id mapping for the given (name, url) pairs, inserting the
+    places that don't exist yet in a single statement.
+    """
+    names = dict((url, name) for name, url in places)
+    ids = dict(db.execute(
+        select(models.Place.url, models.Place.id).where(models.Place.url.in_(list(names)))
+    ).all())
+
+    missing = [{'name': name, 'url': url} for url, name in names.items() if url not in ids]
+    if missing:
+        inserted = db.execute(
+            insert(models.Place).values(missing).returning(models.Place.url, models.Place.id)
+        ).all()
+        ids.update(dict(inserted))
+    return ids
+
+def scrape_row(place_id: int, scrape_time: datetime, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Packs the per-hour items of one scrape into a single `scrapes` row."""
+    current = curve.current_from_items(data) or {}
+    return {
+        'place_id': place_id,
+        'scrape_time': scrape_time,
+        'normal_curve': curve.curve_from_items(data),
+        'current_day': current.get('current_day'),
+        'current_hour': current.get('current_hour'),
+        'popularity_percent_current': current.get('popularity_percent_current'),
+    }
+
+def _copy_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        # PostgreSQL array literal, e.g. {12,NULL,40}
+        return '{' + ','.join('NULL' if v is None else str(v) for v in value) + '}'
+    return value
+
+def _copy_rows(db: Session, table: str, columns: tuple, rows: List[Dict[str, Any]]) -> None:
+    """Streams rows into a PostgreSQL table with COPY, inside the session's transaction."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([_copy_value(row[c]) for c in columns])
+    buf.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf
+        )
+    finally:
+        cursor.close()
+
+def _can_copy(db: Session) -> bool:
+    bind = db.get_bind()
+    return config.BULK_USE_COPY and bind.dialect.name == 'postgresql' and bind.dialect.driver == 'psycopg2'
+
+def bulk_insert_scrapes(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts `scrapes` rows in a single statement: COPY on PostgreSQL with
+    psycopg2, a multi-row INSERT everywhere else. Does not commit.
+    """
+    if not rows:
+        return
+    if _can_copy(db):
+        _copy_rows(db, models.Scrape.__tablename__, SCRAPE_COLUMNS, rows)
+    else:
+        db.execute(insert(models.Scrape).values(rows))
+
+def _has_reading(row: Dict[str, Any]) -> bool:
+    return row['current_day'] is not None and row['popularity_percent_current'] is not None
+
+def _latest_reading_row(row: Dict[str, Any], score: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    normal = None
+    if row['current_day'] is not None:
+        normal = row['normal_curve'][curve.slot(row['current_day'], row['current_hour'])]
+    score = score or {}
+    return {
+        'place_id': row['place_id'],
+        'scrape_time': row['scrape_time'],
+        'current_day': row['current_day'],
+        'current_hour': row['current_hour'],
+        'popularity_percent_current': row['popularity_percent_current'],
+        'popularity_percent_normal': normal,
+        'baseline_z': score.get('z'),
+        'baseline_quantile': score.get('quantile'),
+        'baseline_samples': score.get('samples'),
+    }
+
+def score_rows(rows: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """Scores the live reading of each `scrapes` row against the baseline model."""
+    return [
+        baseline.model.score(row['place_id'], row['current_day'], row['current_hour'], row['popularity_percent_current'])
+        if _has_reading(row) else None
+        for row in rows
+    ]
+
+def observe_rows(rows: List[Dict[str, Any]]) -> None:
+    """Adds the live readings of committed `scrapes` rows to the baseline model."""
+    for row in rows:
+        if _has_reading(row):
+            baseline.model.update(row['place_id'], row['current_day'], row['current_hour'], row['popularity_percent_current'])
+
+def shared_baseline() -> bool:
+    """
+    True when several worker processes write scrapes. Their baseline model is
+    then kept in `baseline_slots`, and each write loads the slots it scores.
+    """
+    return config.SCRAPE_QUEUE != 'local'
+
+def load_baseline_slots(db: Session, place_ids: List[int]) -> None:
+    """
+    Replaces the model's statistics of these places with the stored ones and
+    locks their slots until the end of the transaction.
+    """
+    slot = models.BaselineSlot
+    stored = db.execute(select(slot).where(slot.place_id.in_(place_ids)).with_for_update()).scalars()
+    baseline.model.clear(place_ids)
+    for s in stored:
+        baseline.model.set_slot(s.place_id, s.day, s.hour, s.weight, s.mean, s.m2, s.hist)
+
+def store_baseline_slots(db: Session, keys: List[Tuple[int, int, int]]) -> None:
+    """Writes these (place, day, hour) slots of the model to `baseline_slots`. Does not commit."""
+    if not keys:
+        return
+    stmt = _upsert_insert(db, models.BaselineSlot).values([baseline.model.get_slot(*key) for key in set(keys)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['place_id', 'day', 'hour'],
+        set_={c: stmt.excluded[c] for c in ('weight', 'mean', 'm2', 'hist')},
+    )
+    db.execute(stmt)
+
+def seed_baseline_slots(db: Session, batch_size: int = 1000) -> int:
+    """
+    Fills an empty `baseline_slots` table from the scrape history, once.
+    Returns the number of slots written. Does not commit.
+    """
+    if db.execute(select(models.BaselineSlot.place_id).limit(1)).first() is not None:
+        return 0
+    baseline.model.load(db)
+    keys = baseline.model.slots()
+    for i in range(0, len(keys), batch_size):
+        store_baseline_slots(db, keys[i:i + batch_size])
+    return len(keys)
+
+def _upsert_insert(db: Session, model: Any):
+    # database.py refuses to start on any other dialect
+    if db.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def upsert_latest_readings(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    scores: Optional[List[Optional[Dict[str, Any]]]] = None,
+) -> None:
+    """
+    Updates the per-place latest reading from `scrapes` rows in one statement,
+    keeping whichever reading is newer. Does not commit.
+    """
+    if not rows:
+        return
+    stmt = _upsert_insert(db, models.LatestReading)
+    table = models.LatestReading.__table__
+    scores = scores or [None] * len(rows)
+    stmt = stmt.values([_latest_reading_row(row, score) for row, score in zip(rows, scores)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.place_id],
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name != 'place_id'},
+        where=table.c.scrape_time <= stmt.excluded.scrape_time,
+    )
+    db.execute(stmt)
+
+def rebuild_latest_readings(db: Session) -> int:
+    """Recomputes the latest reading of every place from `scrapes`. Does not commit."""
+    latest = (
+        select(models.Scrape.place_id, func.max(models.Scrape.scrape_time).label('scrape_time'))
+        .group_by(models.Scrape.place_id)
+        .subquery()
+    )
+    scrapes = db.execute(
+        select(models.Scrape).join(
+            latest,
+            (models.Scrape.place_id == latest.c.place_id) & (models.Scrape.scrape_time == latest.c.scrape_time),
+        )
+    ).scalars().all()
+    rows = [{c: getattr(s, c) for c in SCRAPE_COLUMNS} for s in scrapes]
+    upsert_latest_readings(db, rows)
+    return len(rows)
+
+def upsert_index_buckets(db: Session, buckets: List[Dict[str, Any]]) -> None:
+    """Inserts or replaces pizza index buckets in one statement. Does not commit."""
+    if not buckets:
+        return
+    stmt = _upsert_insert(db, models.IndexBucket).values(buckets)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.IndexBucket.__table__.c.bucket_start],
+        set_={'value': stmt.excluded.value, 'places': stmt.excluded.places},
+    )
+    db.execute(stmt)
+
+# First key of the PostgreSQL advisory locks on index buckets
+INDEX_BUCKET_LOCK = 0x7069
+
+def lock_index_bucket(db: Session, scrape_time: datetime) -> None:
+    """
+    Makes concurrent writers to the bucket of `scrape_time` take turns until
+    the end of the transaction, so each recomputes it with the others' scrapes.
+    SQLite already serializes write transactions.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        start = pizza_index.bucket_start(scrape_time)
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:space, :key)"),
+            {'space': INDEX_BUCKET_LOCK, 'key': int(start.timestamp()) // 60},
+        )
+
+def rebuild_index_buckets(db: Session) -> int:
+    """Recomputes every pizza index bucket from `scrapes`. Does not commit."""
+    buckets = pizza_index.all_buckets(db)
+    upsert_index_buckets(db, buckets)
+    return len(buckets)
+
+def write_round(db: Session, results: List[Dict[str, Any]], scrape_time: datetime) -> List[Dict[str, Any]]:
+    """
+    Writes a scrape round with one statement per table, refreshes the latest
+    reading of each place, scored against the baseline model, and recomputes
+    the pizza index bucket of the round. Does not commit. Returns the
+    `scrapes` rows written.
+    """
+    results = [r for r in results if r['data']]
+    if not results:
+        return []
+    place_ids = ensure_places(db, [(scraper.place_name_from_url(r['url']), r['url']) for r in results])
+    rows = [scrape_row(place_ids[r['url']], scrape_time, r['data']) for r in results]
+    shared = shared_baseline()
+    if shared:
+        # Other workers save readings of these places too; score against all of them.
+        load_baseline_slots(db, [row['place_id'] for row in rows])
+    bulk_insert_scrapes(db, rows)
+    upsert_latest_readings(db, rows, score_rows(rows))
+    if shared:
+        observe_rows(rows)
+        store_baseline_slots(db, [
+            (row['place_id'], row['current_day'], row['current_hour']) for row in rows if _has_reading(row)
+        ])
+    # Workers save batches of the same round at once; under READ COMMITTED the
+    # bucket read after the lock sees every batch committed before it.
+    lock_index_bucket(db, scrape_time)
+    bucket = pizza_index.bucket_for(db, scrape_time)
+    if bucket:
+        upsert_index_buckets(db, [bucket])
+    return rows
+
+def save_round(results: List[Dict[str, Any]], scrape_time: datetime, round_id: Optional[int] = None) -> bool:
+    """
+    Writes the results of a scrape round in a single transaction, all stamped
+    with the same scrape time so the places can be compared with each other.
+    With a `round_id`, the URLs are marked done in the round journal in the
+    same transaction. Returns False, after rolling back, if the write failed.
+    """
+    db = SessionLocal()
+    try:
+        with metrics.STAGE_SECONDS.labels('db_write').time():
+            rows = write_round(db, results, scrape_time)
+            if round_id is not None:
+                journal.mark_done(db, round_id, [r['url'] for r in results])
+            db.commit()
+        metrics.DB_WRITES.labels('success').inc()
+        # Only readings that made it to the database are learned from. A shared
+        # model learned them in the transaction, and reloads what it stored.
+        if not shared_baseline():
+            observe_rows(rows)
+        if rows:
+            pizza_index.cache.invalidate()
+            print(f"Successfully saved {len(rows)} scrapes to the database.")
+        return True
+    except Exception as e:
+        metrics.DB_WRITES.labels('error').inc()
+        print(f"Error saving to database: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+def _legacy_runs(rows: Any, window_seconds: float) -> Any:
+    """
+    Groups legacy rows, ordered by url and time, into one list per scrape. The
+    old scraper stamped every hour row with its own datetime.now(), so a scrape
+    is the rows of a url within `window_seconds` of the first one.
+    """
+    run: List[Dict[str, Any]] = []
+    for row in rows:
+        if run and (
+            row['url'] != run[0]['url']
+            or (row['scrape_time'] - run[0]['scrape_time']).total_seconds() > window_seconds
+        ):
+            yield run
+            run = []
+        run.append(dict(row))
+    if run:
+        yield run
+
+def migrate_legacy_scrape_data(batch_size: int = 500, window_seconds: float = 60) -> int:
+    """
+    Converts the old one-row-per-hour `scrape_data` table into `scrapes` rows,
+    stamped with the time of the first row of each scrape. Returns the number
+    of scrapes written; the old table is left untouched.
+    """
+    if not inspect(engine).has_table('scrape_data'):
+        print("No legacy scrape_data table found.")
+        return 0
+
+    legacy = Table('scrape_data', MetaData(), autoload_with=engine)
+    query = select(legacy).order_by(legacy.c.url, legacy.c.scrape_time, legacy.c.id)
+
+    written = 0
+    db = SessionLocal()
+    try:
+        with engine.connect() as conn:
+            rows = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query).mappings()
+            runs = _legacy_runs(rows, window_seconds)
+            while True:
+                batch = list(itertools.islice(runs, batch_size))
+                if not batch:
+                    break
+                place_ids = ensure_places(db, [(items[0]['place'], items[0]['url']) for items in batch])
+                db_rows = [
+                    scrape_row(place_ids[items[0]['url']], items[0]['scrape_time'], items)
+                    for items in batch
+                ]
+                bulk_insert_scrapes(db, db_rows)
+                written += len(db_rows)
+        rebuild_latest_readings(db)
+        rebuild_index_buckets(db)
+        db.commit()
+        pizza_index.cache.invalidate()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"Migrated {written} scrapes from scrape_data.")
+    return written
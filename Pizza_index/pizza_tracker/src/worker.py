@@ -0,0 +1,85 @@
+# pizza_tracker/src/worker.py
+
+import signal
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from prometheus_client import start_http_server
+
+from . import config, driver_pool, jobs, models, storage
+from .database import SessionLocal, engine
+from .executor import ScrapeExecutor
+
+def run_job(payload: Dict[str, Any]) -> bool:
+    """
+    Scrapes the URLs of a job and saves them in one transaction under the
+    round's scrape time. Returns False if the results could not be saved.
+    """
+    scrape_time = datetime.fromisoformat(payload["scrape_time"])
+    results = ScrapeExecutor().run_round(payload["urls"])
+    if not results:
+        print(f"No data scraped for job of {len(payload['urls'])} URLs.")
+        return True
+    return storage.save_round(results, scrape_time)
+
+def serve_metrics(port: int) -> Any:
+    """
+    Serves this process's metrics at http://<host>:<port>/metrics, from a
+    daemon thread. Returns the server; port 0 picks a free port.
+    """
+    server, _ = start_http_server(port)
+    print(f"Worker metrics on port {server.server_port}.")
+    return server
+
+def run(queue: Optional[Any] = None, stop: Optional[threading.Event] = None, poll_seconds: float = 5) -> int:
+    """
+    Takes jobs from the queue until `stop` is set (SIGTERM and SIGINT set it
+    when running from the command line). Returns the number of jobs run.
+    """
+    queue = queue or jobs.get_queue()
+    if queue is None:
+        raise RuntimeError("workers need SCRAPE_QUEUE=sql or SCRAPE_QUEUE=redis")
+    stop = stop or threading.Event()
+
+    models.Base.metadata.create_all(bind=engine)
+    # Workers share the baseline model through the database; the first one
+    # to start fills it from the history.
+    with SessionLocal() as db:
+        seeded = storage.seed_baseline_slots(db)
+        db.commit()
+    if seeded:
+        print(f"Baseline model seeded with {seeded} slots.")
+    print(f"Worker {jobs.worker_name()} waiting for jobs.")
+
+    count = 0
+    try:
+        while not stop.is_set():
+            job = queue.get(poll_seconds)
+            if job is None:
+                continue
+            try:
+                ok = run_job(job[1])
+            except Exception as e:
+                print(f"Error running job: {e}")
+                ok = False
+            if ok:
+                queue.done(job)
+            else:
+                queue.release(job)
+            count += 1
+    finally:
+        driver_pool.close_pool()
+    return count
+
+def main() -> None:
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    # Scrapes are measured here, not in the API process
+    server = serve_metrics(config.WORKER_METRICS_PORT) if config.WORKER_METRICS_PORT else None
+    try:
+        run(stop=stop)
+    finally:
+        if server is not None:
+            server.shutdown()
@@ -0,0 +1,58 @@
+# pizza_tracker/tests/bench_parser.py
+
+"""
+Micro-benchmark of the popular times parser backends against saved pages.
+
+    python -m tests.bench_parser [PAGE.html ...] [--repeat N]
+
+Without pages, the sample page is padded with filler markup to the ~1MB size
+of a real Maps page.
+"""
+
+import argparse
+import time
+from typing import List
+
+from src import scraper
+
+FILLER = '<div class="widget-pane"><span jsan="7.x" aria-hidden="true">Lorem ipsum</span></div>\n'
+
+def padded_sample(size: int = 1024 * 1024) -> str:
+    with open("tests/mock_data/sample_page.html", "r") as f:
+        sample = f.read()
+    head, _, tail = sample.partition("<body>")
+    filler = FILLER * (size // len(FILLER))
+    return head + "<body>" + filler[: len(filler) // 2] + tail + filler[len(filler) // 2:]
+
+def bench(pages: List[str], backend: str, repeat: int) -> float:
+    """Returns the best time, in seconds, to parse all pages once."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for page in pages:
+            scraper.parse_html(page, backend=backend)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="saved HTML pages to parse")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, "r") as f:
+            pages.append(f.read())
+    if not pages:
+        pages = [padded_sample()]
+
+    size_mb = sum(len(p) for p in pages) / 1e6
+    print(f"{len(pages)} page(s), {size_mb:.1f} MB, best of {args.repeat}")
+    baseline = bench(pages, "bs4", args.repeat)
+    for backend in ("bs4", "lxml", "fast"):
+        elapsed = baseline if backend == "bs4" else bench(pages, backend, args.repeat)
+        print(f"{backend:>5}: {elapsed * 1000:8.1f} ms  ({baseline / elapsed:5.1f}x)")
+
+if __name__ == "__main__":
+    main()
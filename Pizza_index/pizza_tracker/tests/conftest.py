@@ -0,0 +1,22 @@
+# pizza_tracker/tests/conftest.py
+
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite database unless a DATABASE_URL is given.
+# This has to happen before anything imports src.database.
+_db_dir = tempfile.mkdtemp(prefix="pizza_tracker_tests_")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(_db_dir, "test.db"))
+
+@pytest.fixture(autouse=True, scope="module")
+def create_tables():
+    from src import baseline, models, pizza_index
+    from src.database import engine
+    models.Base.metadata.create_all(bind=engine)
+    # Place ids start over with the tables, so the model's statistics must too.
+    baseline.model = baseline.BaselineModel()
+    pizza_index.cache.invalidate()
+    yield
+    models.Base.metadata.drop_all(bind=engine)
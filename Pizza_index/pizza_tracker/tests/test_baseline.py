@@ -0,0 +1,84 @@
+# pizza_tracker/tests/test_baseline.py
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import numpy as np
+from src import baseline, models, storage, status
+from src.database import SessionLocal
+
+def test_score_matches_mean_and_variance():
+    model = baseline.BaselineModel(decay=1.0)
+    values = [30, 50, 35, 45, 40, 40]
+    for v in values:
+        model.update(1, 5, 19, v)
+    score = model.score(1, 5, 19, 70)
+    assert score["samples"] == len(values)
+    assert abs(score["z"] - (70 - np.mean(values)) / np.std(values)) < 1e-9
+    assert score["quantile"] == 1.0
+    assert model.score(1, 5, 19, 20)["quantile"] == 0.0
+
+def test_old_readings_decay():
+    model = baseline.BaselineModel(decay=0.5)
+    for _ in range(20):
+        model.update(1, 0, 0, 10)
+    for _ in range(20):
+        model.update(1, 0, 0, 90)
+    assert model.score(1, 0, 0, 90)["z"] < 1
+    assert model.score(1, 0, 0, 90)["samples"] < 2.0
+
+def test_unknown_slot_has_no_score():
+    model = baseline.BaselineModel()
+    model.update(1, 0, 0, 10)
+    assert model.score(1, 0, 1, 10)["z"] is None
+    assert model.score(2, 0, 0, 10)["z"] is None
+
+def test_status_uses_baseline_once_warm():
+    url = "https://www.google.com/maps/search/?api=1&query=Baseline+Pizza"
+    start = datetime(2031, 1, 3, 20)
+
+    def save(week, current):
+        data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 50, "popularity_percent_current": current}]
+        storage.save_round([{"url": url, "data": data}], start + timedelta(weeks=week))
+
+    for week, current in enumerate([30, 32, 29, 31, 30, 28, 31, 30, 29, 30]):
+        save(week, current)
+    # Below Google's 1.5x rule, but far above anything observed at this hour
+    save(10, 60)
+
+    db = SessionLocal()
+    try:
+        reading = db.query(models.LatestReading).join(models.Place).filter(models.Place.name == "Baseline+Pizza").one()
+        verdict = status.evaluate_reading(reading)
+    finally:
+        db.close()
+    assert verdict["baseline_z"] > 5
+    assert verdict["status"] == "abnormal"
+
+def test_workers_score_against_readings_saved_by_others():
+    url = "https://www.google.com/maps/search/?api=1&query=Shared+Baseline+Pizza"
+    start = datetime(2032, 1, 2, 20)
+    workers = [baseline.BaselineModel(decay=1.0), baseline.BaselineModel(decay=1.0)]
+    with patch.object(storage.config, "SCRAPE_QUEUE", "sql"):
+        for week, current in enumerate([30, 32, 29, 31, 60]):
+            data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 50, "popularity_percent_current": current}]
+            # jobs of the same place land on either worker
+            with patch.object(baseline, "model", workers[week % 2]):
+                storage.save_round([{"url": url, "data": data}], start + timedelta(weeks=week))
+
+    with SessionLocal() as db:
+        reading = db.query(models.LatestReading).join(models.Place).filter(models.Place.name == "Shared+Baseline+Pizza").one()
+        slot = db.get(models.BaselineSlot, (reading.place_id, 5, 20))
+    assert reading.baseline_samples == 4
+    assert reading.baseline_z > 5
+    # the stored statistics include the last reading, without replaying the history
+    assert slot.weight == 5
+
+def test_baseline_slots_are_seeded_from_history_once():
+    with SessionLocal() as db:
+        db.query(models.BaselineSlot).delete()
+        with patch.object(baseline, "model", baseline.BaselineModel()):
+            seeded = storage.seed_baseline_slots(db)
+            assert seeded > 0
+            assert storage.seed_baseline_slots(db) == 0
+        assert db.query(models.BaselineSlot).count() == seeded
+        db.rollback()
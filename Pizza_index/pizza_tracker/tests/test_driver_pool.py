@@ -0,0 +1,68 @@
+# pizza_tracker/tests/test_driver_pool.py
+
+import pytest
+from src.driver_pool import DriverPool
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+def make_factory(created):
+    def factory():
+        driver = FakeDriver()
+        created.append(driver)
+        return driver
+    return factory
+
+def test_sessions_are_reused():
+    created = []
+    pool = DriverPool(make_factory(created), size=1, max_pages=10)
+    for _ in range(3):
+        with pool.driver() as d:
+            assert d is created[0]
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["reuses"] == 2
+    assert stats["checkouts"] == 3
+
+def test_session_recycled_after_max_pages():
+    created = []
+    pool = DriverPool(make_factory(created), size=1, max_pages=2)
+    for _ in range(3):
+        with pool.driver():
+            pass
+    assert len(created) == 2
+    assert created[0].quit_called
+    assert pool.stats()["recycled"] == 1
+
+def test_crashed_session_is_discarded():
+    created = []
+    pool = DriverPool(make_factory(created), size=1, max_pages=10)
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            raise RuntimeError("chrome died")
+    assert created[0].quit_called
+    with pool.driver() as d:
+        assert d is created[1]
+    assert pool.stats()["crashed"] == 1
+
+def test_checkout_times_out_when_pool_exhausted():
+    pool = DriverPool(FakeDriver, size=1)
+    with pool.driver():
+        with pytest.raises(TimeoutError):
+            with pool.driver(timeout=0.01):
+                pass
+
+def test_close_quits_idle_sessions():
+    created = []
+    pool = DriverPool(make_factory(created), size=2)
+    with pool.driver():
+        pass
+    pool.close()
+    assert created[0].quit_called
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            pass
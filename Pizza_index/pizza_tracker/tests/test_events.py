@@ -0,0 +1,60 @@
+# pizza_tracker/tests/test_events.py
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+from unittest.mock import patch
+from src import events, storage
+
+def parse(message):
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+def test_broadcaster_delivers_events_published_from_threads():
+    broadcaster = events.Broadcaster(queue_size=2)
+
+    async def run():
+        queue = broadcaster.subscribe()
+        threads = [threading.Thread(target=broadcaster.publish, args=("reading", {"n": n})) for n in range(3)]
+        for t in threads:
+            t.start()
+            t.join()
+        await asyncio.sleep(0)
+        return [parse(queue.get_nowait()) for _ in range(queue.qsize())]
+
+    # The slow client only keeps the newest two events.
+    assert asyncio.run(run()) == [("reading", {"n": 1}), ("reading", {"n": 2})]
+
+def test_publish_round_sends_readings_and_transitions():
+    url = "https://www.google.com/maps/search/?api=1&query=Pushed+Pizza"
+    published = []
+
+    class Recorder(events.Broadcaster):
+        def publish(self, event, data):
+            published.append((event, data["status"]))
+            super().publish(event, data)
+
+    broadcaster = Recorder()
+
+    with patch.object(events, "broadcaster", broadcaster):
+        for scrape_time, current in ((datetime(2030, 5, 3, 20, 0), 30), (datetime(2030, 5, 3, 21, 0), 35), (datetime(2030, 5, 3, 22, 0), 90)):
+            data = [{"day_of_week": "Friday", "hour_of_day": scrape_time.hour, "popularity_percent_normal": 40, "popularity_percent_current": current}]
+            storage.save_round([{"url": url, "data": data}], scrape_time)
+            events.publish_round(scrape_time)
+
+    assert published == [
+        ("reading", "nominal"), ("status", "nominal"),
+        ("reading", "nominal"),
+        ("reading", "abnormal"), ("status", "abnormal"),
+    ]
+
+def test_rounds_are_published_once_their_batches_are_in():
+    first, late = datetime(2024, 6, 1, 12, 0), datetime(2024, 6, 1, 13, 0)
+    published = {first: 3}
+    # a batch of the second round is in, more are coming
+    assert events.settled_rounds({first: 3}, {first: 3, late: 2}, published) == []
+    assert events.settled_rounds({first: 3, late: 2}, {first: 3, late: 2}, published) == [late]
+    # a batch of an already published round that committed late
+    published[late] = 2
+    assert events.settled_rounds({first: 4, late: 2}, {first: 4, late: 2}, published) == [first]
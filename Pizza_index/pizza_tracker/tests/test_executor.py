@@ -0,0 +1,27 @@
+# pizza_tracker/tests/test_executor.py
+
+import time
+from src.executor import DomainRateLimiter, ScrapeExecutor
+
+def test_run_round_keeps_order_and_drops_empty_results():
+    data = {"a": [{"hour_of_day": 1}], "b": [], "c": [{"hour_of_day": 2}]}
+    executor = ScrapeExecutor(workers=3, domain_min_interval=0, fetch=lambda url: data[url.split("/")[-1]])
+    results = executor.run_round(["http://x/a", "http://x/b", "http://x/c"])
+    assert [r["url"] for r in results] == ["http://x/a", "http://x/c"]
+
+def test_run_round_survives_failing_scrape():
+    def fetch(url):
+        if url.endswith("bad"):
+            raise RuntimeError("boom")
+        return [{"hour_of_day": 1}]
+    results = ScrapeExecutor(workers=2, domain_min_interval=0, fetch=fetch).run_round(["http://x/bad", "http://x/ok"])
+    assert [r["url"] for r in results] == ["http://x/ok"]
+
+def test_rate_limiter_spaces_requests_per_domain():
+    limiter = DomainRateLimiter(0.05)
+    started = time.monotonic()
+    limiter.wait("http://a.example/1")
+    limiter.wait("http://b.example/1")
+    assert time.monotonic() - started < 0.05
+    limiter.wait("http://a.example/2")
+    assert time.monotonic() - started >= 0.05
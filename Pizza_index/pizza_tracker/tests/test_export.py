@@ -0,0 +1,48 @@
+# pizza_tracker/tests/test_export.py
+
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sqlalchemy import insert
+from src import export, models, storage
+from src.database import SessionLocal
+
+def save(place, scrape_time, hours):
+    url = f"https://www.google.com/maps/search/?api=1&query={place}"
+    data = [{"day_of_week": "Tuesday", "hour_of_day": h, "popularity_percent_normal": h, "popularity_percent_current": None} for h in hours]
+    storage.save_round([{"url": url, "data": data}], scrape_time)
+
+def test_export_is_partitioned_and_incremental(tmp_path):
+    save("Export+A", datetime(2024, 1, 31, 12), range(10))
+    save("Export+B", datetime(2024, 2, 1, 12), range(5))
+    assert export.export_parquet(str(tmp_path)) == 15
+
+    # Only scrapes added since the last run are written.
+    assert export.export_parquet(str(tmp_path)) == 0
+    save("Export+A", datetime(2024, 2, 2, 12), range(3))
+    assert export.export_parquet(str(tmp_path)) == 3
+
+    table = ds.dataset(str(tmp_path), format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 18
+    partitions = set(zip(table.column("place").to_pylist(), table.column("month").to_pylist()))
+    assert partitions == {("Export+A", "2024-01"), ("Export+B", "2024-02"), ("Export+A", "2024-02")}
+    assert table.schema.field("hour_of_day").type == pa.int8()
+    assert pa.types.is_dictionary(table.schema.field("day_of_week").type)
+
+def test_export_picks_up_scrapes_committed_late(tmp_path):
+    save("Export+Early", datetime(2024, 3, 1, 12), range(2))
+    save("Export+Late", datetime(2024, 3, 1, 12), range(4))
+    save("Export+Later", datetime(2024, 3, 1, 13), range(1))
+    with SessionLocal() as db:
+        late = db.query(models.Scrape).join(models.Place).filter(models.Place.url.endswith("Export+Late")).one()
+        row = {c.name: getattr(late, c.name) for c in models.Scrape.__table__.columns}
+        # the round with the lower id was still uncommitted during the first export
+        db.delete(late)
+        db.commit()
+    export.export_parquet(str(tmp_path))
+
+    with SessionLocal() as db:
+        db.execute(insert(models.Scrape).values(row))
+        db.commit()
+    assert export.export_parquet(str(tmp_path)) == 4
+    assert export.export_parquet(str(tmp_path)) == 0
@@ -0,0 +1,76 @@
+# pizza_tracker/tests/test_journal.py
+
+from datetime import datetime
+from unittest.mock import patch
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+from src import journal, models, scheduler
+from src.database import SessionLocal
+
+BASE = "https://www.google.com/maps/search/?api=1&query=Journal+Pizza+"
+
+def data_for(url):
+    return [{"day_of_week": "Monday", "hour_of_day": 12, "popularity_percent_normal": 50, "popularity_percent_current": None}]
+
+@pytest.fixture(autouse=True)
+def quiet_round():
+    with patch.object(scheduler.time, "sleep"), patch.object(scheduler.events, "publish_round"):
+        yield
+
+def scrapes_of(url):
+    with SessionLocal() as db:
+        return db.query(models.Scrape).join(models.Place).filter(models.Place.url == url).all()
+
+def test_failed_url_is_retried_in_the_same_round():
+    urls = [BASE + "A", BASE + "Flaky"]
+    calls = []
+    def fetch(url):
+        calls.append(url)
+        if url.endswith("Flaky") and calls.count(url) == 1:
+            return []
+        return data_for(url)
+
+    with patch("src.scraper.get_popular_times", side_effect=fetch):
+        scheduler.scrape_round(urls)
+
+    assert calls.count(BASE + "Flaky") == 2
+    assert scrapes_of(BASE + "A")[0].scrape_time == scrapes_of(BASE + "Flaky")[0].scrape_time
+    with SessionLocal() as db:
+        flaky = db.query(models.RoundUrl).filter(models.RoundUrl.url == BASE + "Flaky").one()
+        assert (flaky.status, flaky.attempts) == ("done", 1)
+        assert flaky.round.finished_at is not None
+
+def test_interrupted_round_resumes_where_it_stopped():
+    urls = [BASE + "Saved", BASE + "Lost"]
+    round_id, scrape_time, pending = journal.open_round(urls)
+    assert pending == urls
+    # the process died after the first checkpoint
+    checkpoint = scheduler.Checkpoint(round_id, scrape_time, every=1)
+    checkpoint.add(BASE + "Saved", data_for(BASE + "Saved"))
+
+    with patch("src.scraper.get_popular_times", side_effect=data_for) as fetch:
+        scheduler.scrape_round(urls)
+
+    assert [c.args[0] for c in fetch.call_args_list] == [BASE + "Lost"]
+    assert [s.scrape_time for s in scrapes_of(BASE + "Lost")] == [scrape_time]
+    assert len(scrapes_of(BASE + "Saved")) == 1
+
+@pytest.mark.parametrize("mode", ["fixed", "adaptive"])
+def test_scheduler_start_resumes_round_cut_short_by_restart(mode):
+    urls = [BASE + mode + "+Saved", BASE + mode + "+Lost"]
+    round_id, scrape_time, _ = journal.open_round(urls)
+    scheduler.Checkpoint(round_id, scrape_time, every=1).add(urls[0], data_for(urls[0]))
+
+    # the process restarts and schedules its jobs
+    background = BackgroundScheduler()
+    with patch.object(scheduler.config, "SCHEDULER_MODE", mode), \
+            patch.object(scheduler.config, "PARQUET_EXPORT_INTERVAL_HOURS", 0):
+        scheduler.schedule_scraping_jobs(background)
+    first = {"fixed": "resume_round", "adaptive": "scrape_round"}[mode]
+    job = background.get_job(first)
+    with patch("src.scraper.get_popular_times", side_effect=data_for) as fetch:
+        job.func(*job.args, **job.kwargs)
+
+    assert [c.args[0] for c in fetch.call_args_list] == [urls[1]]
+    assert [s.scrape_time for s in scrapes_of(urls[1])] == [scrape_time]
+    assert journal.unfinished_round() is None
@@ -1,7 +1,9 @@
 # pizza_tracker/tests/test_main.py
 
 from fastapi.testclient import TestClient
+from datetime import datetime
 from src.main import app
+from src import storage
 
 client = TestClient(app)
 
@@ -13,9 +15,62 @@ def test_read_main():
 def test_get_status():
     response = client.get("/api/status")
     assert response.status_code == 200
-    assert response.json() == {"status": "nominal"}
+    body = response.json()
+    assert body["status"] == "nominal"
+    assert isinstance(body["places"], list)
 
 def test_get_data():
     response = client.get("/api/data")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_get_status_flags_abnormal_place():
+    url = "https://www.google.com/maps/search/?api=1&query=Busy+Pizza"
+    data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 40, "popularity_percent_current": 90}]
+    storage.save_round([{"url": url, "data": data}], datetime(2030, 1, 1, 20, 0))
+    body = client.get("/api/status").json()
+    assert body["status"] == "abnormal"
+    busy = [p for p in body["places"] if p["place"] == "Busy+Pizza"]
+    assert busy[0]["status"] == "abnormal"
+
+def test_get_data_filters_and_paginates():
+    url = "https://www.google.com/maps/search/?api=1&query=Paged+Pizza"
+    data = [{"day_of_week": "Monday", "hour_of_day": h, "popularity_percent_normal": h, "popularity_percent_current": None} for h in range(24)]
+    storage.save_round([{"url": url, "data": data}], datetime(2030, 2, 1, 12, 0))
+
+    params = {"place": "Paged+Pizza", "day_of_week": "Monday", "limit": 10}
+    first = client.get("/api/data", params=params)
+    assert [r["hour_of_day"] for r in first.json()] == list(range(10))
+    second = client.get("/api/data", params={**params, "cursor": first.headers["X-Next-Cursor"]})
+    assert [r["hour_of_day"] for r in second.json()] == list(range(10, 20))
+
+    hour = client.get("/api/data", params={"place": "Paged+Pizza", "hour": 7}).json()
+    assert [(r["day_of_week"], r["hour_of_day"]) for r in hour] == [("Monday", 7)]
+
+def test_get_data_streams_csv():
+    url = "https://www.google.com/maps/search/?api=1&query=Csv+Pizza"
+    data = [{"day_of_week": "Sunday", "hour_of_day": h, "popularity_percent_normal": h, "popularity_percent_current": None} for h in range(24)]
+    storage.save_round([{"url": url, "data": data}], datetime(2030, 2, 2, 12, 0))
+    response = client.get("/api/data", params={"place": "Csv+Pizza", "format": "csv"})
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("place,url,scrape_time")
+    assert len(lines) == 25
+
+def test_get_data_rejects_bad_day():
+    assert client.get("/api/data", params={"day_of_week": "Caturday"}).status_code == 400
+
+def test_metrics_count_outcomes_per_place():
+    from src.executor import ScrapeExecutor
+    def fetch(url):
+        if "Failing" in url:
+            raise RuntimeError("boom")
+        return [{"hour_of_day": 1}]
+    urls = ["https://www.google.com/maps/search/?api=1&query=" + q for q in ("Metered+Pizza", "Failing+Pizza")]
+    ScrapeExecutor(workers=2, domain_min_interval=0, fetch=fetch).run_round(urls)
+    storage.save_round([], datetime(2030, 6, 1, 12, 0))
+
+    body = client.get("/metrics").text
+    assert 'pizza_scrapes_total{outcome="success",place="Metered+Pizza"} 1.0' in body
+    assert 'pizza_scrapes_total{outcome="error",place="Failing+Pizza"} 1.0' in body
+    assert 'pizza_scrape_stage_seconds_count{stage="db_write"}' in body
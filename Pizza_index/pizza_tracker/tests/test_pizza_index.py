@@ -0,0 +1,56 @@
+# pizza_tracker/tests/test_pizza_index.py
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from src import curve, pizza_index, storage
+from src.main import app
+
+client = TestClient(app)
+
+def reading(place_id, scrape_time, current, normal):
+    normal_curve = [None] * curve.SLOTS
+    normal_curve[curve.slot(5, 20)] = normal
+    return SimpleNamespace(
+        place_id=place_id, scrape_time=scrape_time, normal_curve=normal_curve,
+        current_day=5, current_hour=20, popularity_percent_current=current,
+    )
+
+def test_compute_buckets_averages_latest_ratio_per_place():
+    buckets = pizza_index.compute_buckets([
+        reading(1, datetime(2024, 3, 1, 20, 5), 20, 40),
+        reading(1, datetime(2024, 3, 1, 20, 35), 80, 40),
+        reading(2, datetime(2024, 3, 1, 20, 40), 50, 50),
+        reading(3, datetime(2024, 3, 1, 20, 45), 50, 0),
+        reading(1, datetime(2024, 3, 1, 21, 10), 40, 40),
+    ])
+    assert buckets == [
+        {"bucket_start": datetime(2024, 3, 1, 20, 0), "value": 1.5, "places": 2},
+        {"bucket_start": datetime(2024, 3, 1, 21, 0), "value": 1.0, "places": 1},
+    ]
+
+def test_index_endpoint_reflects_new_rounds():
+    data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 40, "popularity_percent_current": 60}]
+    url = "https://www.google.com/maps/search/?api=1&query=Index+Pizza"
+    params = {"start": "2030-03-01T00:00:00"}
+    storage.save_round([{"url": url, "data": data}], datetime(2030, 3, 1, 20, 10))
+    assert client.get("/api/index", params=params).json() == [
+        {"bucket_start": "2030-03-01T20:00:00", "value": 1.5, "places": 1},
+    ]
+
+    # A second place in the same bucket must show up despite the cached series.
+    data[0]["popularity_percent_current"] = 20
+    storage.save_round([{"url": url + "+Two", "data": data}], datetime(2030, 3, 1, 20, 40))
+    assert client.get("/api/index", params=params).json() == [
+        {"bucket_start": "2030-03-01T20:00:00", "value": 1.0, "places": 2},
+    ]
+
+def test_writers_of_one_bucket_share_a_lock_on_postgres():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    storage.lock_index_bucket(db, datetime(2024, 5, 6, 12, 3))
+    storage.lock_index_bucket(db, datetime(2024, 5, 6, 12, 7))
+    (first, first_params), (second, second_params) = [c.args for c in db.execute.call_args_list]
+    assert "pg_advisory_xact_lock" in str(first)
+    assert first_params == second_params
@@ -0,0 +1,85 @@
+# pizza_tracker/tests/test_priority.py
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from src import curve, priority, scheduler
+
+# A Friday
+NOW = datetime(2030, 5, 3, 20, 0)
+FRIDAY = 5
+
+def friday_curve(**hours):
+    normal_curve = [None] * curve.SLOTS
+    for hour, value in hours.items():
+        normal_curve[curve.slot(FRIDAY, int(hour[1:]))] = value
+    return normal_curve
+
+def state(url, hours_ago, normal_curve, **kwargs):
+    return priority.PlaceState(url, NOW - timedelta(hours=hours_ago), normal_curve, **kwargs)
+
+def test_weight_favours_peak_hours_and_deviations():
+    peak = state("peak", 2, friday_curve(h12=50, h20=100))
+    quiet = state("quiet", 2, friday_curve(h12=100, h20=25))
+    closed = state("closed", 2, friday_curve(h12=100))
+    deviating = state("deviating", 2, friday_curve(h12=100, h20=25), current=50, normal=25)
+    assert priority.weight(closed, NOW) == 0
+    assert priority.weight(quiet, NOW) == 0.25
+    assert priority.weight(peak, NOW) == 1.0
+    assert priority.weight(deviating, NOW) == 1.25
+
+def test_planner_spends_budget_on_most_urgent_places():
+    planner = priority.Planner(budget_per_hour=2)
+    states = [
+        state("quiet", 3, friday_curve(h20=25, h12=100)),
+        state("peak", 3, friday_curve(h20=100)),
+        state("closed", 3, friday_curve(h12=100)),
+        state("just-scraped", 0.1, friday_curve(h20=100)),
+        priority.PlaceState("new"),
+    ]
+    assert planner.plan(states, NOW) == ["new", "peak"]
+    # Both were scraped. The budget is spent; half an hour later one more scrape is allowed.
+    states[1].last_scrape = states[4].last_scrape = NOW
+    assert planner.plan(states, NOW) == []
+    assert planner.plan(states, NOW + timedelta(minutes=30)) == ["quiet"]
+
+def test_closed_place_is_still_scraped_once_per_interval():
+    planner = priority.Planner(budget_per_hour=5)
+    assert planner.plan([state("closed", 25, friday_curve(h12=100))], NOW) == ["closed"]
+
+def test_load_states_reads_latest_scrape():
+    from src import storage
+    from src.database import SessionLocal
+    url = "https://www.google.com/maps/search/?api=1&query=Planned+Pizza"
+    data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 40, "popularity_percent_current": 60}]
+    storage.save_round([{"url": url, "data": data}], NOW - timedelta(hours=1))
+    with SessionLocal() as db:
+        known, unknown = priority.load_states(db, [url, url + "+New"])
+    assert (known.last_scrape, known.current, known.normal) == (NOW - timedelta(hours=1), 60, 40)
+    assert known.normal_curve[curve.slot(FRIDAY, 20)] == 40
+    assert unknown.last_scrape is None
+
+def test_failing_place_backs_off_instead_of_taking_every_tick():
+    planner = priority.Planner(budget_per_hour=12)
+    dead = priority.PlaceState("dead")
+    peak = state("peak", 3, friday_curve(h20=100, h21=100, h22=100, h23=100))
+    picks = []
+    # Ticks every 10 minutes for 4 hours; "dead" never gets a scrape saved.
+    for tick in range(24):
+        now = NOW + timedelta(minutes=10 * tick)
+        for url in planner.plan([dead, peak], now):
+            picks.append(url)
+            if url == "peak":
+                peak.last_scrape = now
+    # 1st attempt, then after 1h, 2h more: the budget is left to the live place
+    assert picks.count("dead") == 3
+    assert picks.count("peak") == 4
+
+def test_adaptive_tick_does_not_retry_within_the_round():
+    url = "https://www.google.com/maps/search/?api=1&query=Always+Failing+Pizza"
+    with patch.object(scheduler, "URLS_TO_SCRAPE", [url]), \
+            patch.object(priority, "planner", priority.Planner(budget_per_hour=12)), \
+            patch.object(scheduler.time, "sleep"), patch.object(scheduler.events, "publish_round"), \
+            patch("src.scraper.get_popular_times", return_value=[]) as fetch:
+        scheduler.priority_tick(NOW)
+        scheduler.priority_tick(NOW + timedelta(minutes=10))
+    assert fetch.call_count == 1
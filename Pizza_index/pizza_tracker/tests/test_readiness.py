@@ -0,0 +1,38 @@
+# pizza_tracker/tests/test_readiness.py
+
+from src import readiness
+
+class FakePage:
+    """Answers the readiness script from a list of (bars, panel) states, one per poll."""
+
+    def __init__(self, states):
+        self.states = list(states)
+
+    def execute_script(self, script, bar_class):
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+def test_returns_as_soon_as_bars_render():
+    times = readiness.LoadTimes(min_samples=1)
+    page = FakePage([(False, False), (False, True), (True, True)])
+    assert readiness.wait_ready(page, "Fast+Pizza", times) == readiness.BARS
+    assert times.timeout("Fast+Pizza") == times.minimum
+
+def test_place_without_popular_times_bails_out_after_grace():
+    now = [0.0]
+    state = readiness.PageState(grace=3, clock=lambda: now[0])
+    page = FakePage([(False, True)])
+    assert state(page) is False
+    now[0] = 2.0
+    assert state(page) is False
+    now[0] = 3.0
+    assert state(page) == readiness.NO_DATA
+
+def test_timeout_follows_p95_of_load_times():
+    times = readiness.LoadTimes(min_samples=5, margin=1.5, minimum=2, maximum=30)
+    for seconds in [1, 2, 3, 4]:
+        times.record("Pizza", seconds)
+    assert times.timeout("Pizza") == 30
+    for seconds in range(5, 21):
+        times.record("Pizza", seconds)
+    assert times.timeout("Pizza") == 28.5
+    assert times.timeout("Other+Pizza") == 30
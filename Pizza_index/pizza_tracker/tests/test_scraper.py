@@ -2,7 +2,7 @@
 
 import pytest
 from unittest.mock import patch
-from src import scraper
+from src import scraper, http_fetch
 
 @pytest.fixture
 def mock_html():
@@ -19,3 +19,73 @@ def test_get_popular_times(mock_get_html, mock_html):
     assert "day_of_week" in data[0]
     assert "hour_of_day" in data[0]
     assert "popularity_percent_normal" in data[0]
+
+@pytest.fixture
+def mock_payload_html():
+    """Provides a page whose popular times are only in the embedded data."""
+    with open("tests/mock_data/sample_payload.html", "r") as f:
+        return f.read()
+
+def test_parse_payload(mock_payload_html):
+    data = http_fetch.parse_payload(mock_payload_html)
+    assert data[0] == {"day_of_week": "Sunday", "hour_of_day": 6, "popularity_percent_normal": 25, "popularity_percent_current": None}
+    assert {d["day_of_week"] for d in data} == {"Sunday", "Monday", "Tuesday", "Thursday", "Friday", "Saturday"}
+    assert len(data) == 6 * 17
+
+@patch("src.scraper.get_html")
+@patch("src.http_fetch.fetch_html")
+def test_http_backend_skips_selenium(mock_fetch_html, mock_get_html, mock_payload_html):
+    mock_fetch_html.return_value = mock_payload_html
+    data = scraper.get_popular_times("some_url", backend="http")
+    assert len(data) > 0
+    mock_get_html.assert_not_called()
+
+@patch("src.scraper.get_html")
+@patch("src.http_fetch.fetch_html")
+def test_auto_backend_falls_back_to_selenium(mock_fetch_html, mock_get_html, mock_html):
+    mock_fetch_html.return_value = "<html></html>"
+    mock_get_html.return_value = mock_html
+    scraper.get_popular_times("some_url", backend="auto")
+    mock_get_html.assert_called_once_with("some_url")
+
+TRICKY_HTML = """
+<style>.section-popular-times-bar { height: 1px }</style>
+<script>var c = "section-popular-times-bar";</script>
+<div class="other section-popular-times-bar" aria-label="Normalerweise 5 % Betrieb um 7 Uhr" data-x="a>b"></div>
+<div class="section-popular-times-bar-label" aria-label="not a bar"></div>
+<DIV CLASS='section-popular-times-bar' ARIA-LABEL='Normalerweise 8 &#37; Betrieb um 8 Uhr'></DIV>
+"""
+
+@pytest.mark.parametrize("backend", ["fast", "lxml", "bs4"])
+def test_parser_backends_agree(backend, mock_html):
+    assert scraper.parse_html(mock_html, backend=backend) == scraper.parse_html(mock_html, backend="bs4")
+    assert scraper.bar_labels(TRICKY_HTML, backend=backend) == [
+        "Normalerweise 5 % Betrieb um 7 Uhr",
+        "Normalerweise 8 % Betrieb um 8 Uhr",
+    ]
+
+@pytest.mark.parametrize("profile", ["light", "default"])
+def test_create_driver_applies_browser_profile(profile):
+    with patch.object(scraper.config, "BROWSER_PROFILE", profile), \
+            patch.object(scraper.config, "CHROMEDRIVER_BINARY_LOCATION", None), \
+            patch("src.scraper.webdriver.Chrome") as chrome:
+        d = scraper.create_driver()
+    options = chrome.call_args.kwargs["options"]
+    cdp = [c.args[0] for c in d.execute_cdp_cmd.call_args_list]
+    if profile == "light":
+        assert "--disable-gpu" in options.arguments
+        assert cdp == ["Network.enable", "Network.setBlockedURLs"]
+    else:
+        assert "--disable-gpu" not in options.arguments
+        assert cdp == []
+
+@patch("src.driver_pool.get_pool")
+def test_driver_errors_are_counted_as_errors(mock_get_pool):
+    from src import metrics
+    from src.executor import ScrapeExecutor
+    mock_get_pool.return_value.driver.return_value.__enter__.return_value.get.side_effect = RuntimeError("tab crashed")
+    url = "https://www.google.com/maps/search/?api=1&query=Crashing+Pizza"
+    with patch.object(scraper, "backend_for", return_value="selenium"):
+        assert ScrapeExecutor(workers=1, domain_min_interval=0).run_round([url]) == []
+    assert metrics.SCRAPES.labels("Crashing+Pizza", "error")._value.get() == 1
+    assert metrics.SCRAPES.labels("Crashing+Pizza", "no_data")._value.get() == 0
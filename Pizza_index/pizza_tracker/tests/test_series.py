@@ -0,0 +1,69 @@
+# pizza_tracker/tests/test_series.py
+
+from datetime import datetime
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from src import models, series, storage
+from src.database import SessionLocal
+from src.main import app
+
+client = TestClient(app)
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[500] = 100
+    idx = series.lttb(x, y, 50)
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == 999
+    assert 500 in idx
+    assert np.all(np.diff(idx) > 0)
+
+def test_bucket_means_ignores_missing_values():
+    t = np.array(["2024-01-01T10:05", "2024-01-01T10:55", "2024-01-01T11:10"], dtype="datetime64[s]")
+    buckets, (means,) = series.bucket_means(t, [np.array([10.0, np.nan, 30.0])], "h")
+    assert [str(b) for b in buckets] == ["2024-01-01T10:00:00", "2024-01-01T11:00:00"]
+    assert means.tolist() == [10.0, 30.0]
+
+def test_series_endpoint_downsamples_and_revalidates():
+    url = "https://www.google.com/maps/search/?api=1&query=Series+Pizza"
+    for minute, current in ((0, 20), (30, 40)):
+        data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 50, "popularity_percent_current": current}]
+        storage.save_round([{"url": url, "data": data}], datetime(2030, 4, 5, 20, minute))
+
+    params = {"place": "Series+Pizza", "resolution": "hour"}
+    response = client.get("/api/series", params=params)
+    assert response.status_code == 200
+    assert response.json() == [{"place": "Series+Pizza", "t": ["2030-04-05T20:00:00"], "current": [30.0], "normal": [50.0]}]
+
+    etag = response.headers["etag"]
+    assert client.get("/api/series", params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    data[0]["popularity_percent_current"] = 60
+    storage.save_round([{"url": url, "data": data}], datetime(2030, 4, 5, 21, 0))
+    response = client.get("/api/series", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["current"] == [30.0, 60.0]
+
+def test_series_changes_when_a_lower_id_commits_late():
+    url = "https://www.google.com/maps/search/?api=1&query=Late+Series+Pizza"
+    params = {"place": "Late+Series+Pizza", "resolution": "raw"}
+    data = [{"day_of_week": "Friday", "hour_of_day": 20, "popularity_percent_normal": 50, "popularity_percent_current": 20}]
+    for minute in (0, 10, 20):
+        storage.save_round([{"url": url, "data": data}], datetime(2030, 5, 3, 20, minute))
+    with SessionLocal() as db:
+        scrapes = db.query(models.Scrape).join(models.Place).filter(models.Place.url == url).order_by(models.Scrape.id).all()
+        middle = {c.name: getattr(scrapes[1], c.name) for c in models.Scrape.__table__.columns}
+        # this batch has not committed yet when the series is first read
+        db.delete(scrapes[1])
+        db.commit()
+
+    response = client.get("/api/series", params=params)
+    assert len(response.json()[0]["t"]) == 2
+    with SessionLocal() as db:
+        db.execute(insert(models.Scrape).values(middle))
+        db.commit()
+    response = client.get("/api/series", params=params, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 200
+    assert len(response.json()[0]["t"]) == 3
@@ -0,0 +1,110 @@
+# pizza_tracker/tests/test_storage.py
+
+import itertools
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table
+from src import curve, models, storage
+from src.database import SessionLocal, engine
+
+URL = "https://www.google.com/maps/search/?api=1&query=Test+Pizza+1+Main+St"
+
+def make_results(hours, url=URL, current_hour=None):
+    return [{
+        "url": url,
+        "data": [
+            {
+                "day_of_week": "Monday",
+                "hour_of_day": h,
+                "popularity_percent_normal": h * 2,
+                "popularity_percent_current": 70 if h == current_hour else None,
+            }
+            for h in hours
+        ],
+    }]
+
+def query_scrapes(scrape_time):
+    db = SessionLocal()
+    try:
+        return db.query(models.Scrape).filter(models.Scrape.scrape_time == scrape_time).all()
+    finally:
+        db.close()
+
+def test_save_round_writes_one_row_per_place():
+    scrape_time = datetime(2024, 1, 1, 12, 0)
+    assert storage.save_round(make_results(range(24), current_hour=12), scrape_time)
+    scrapes = query_scrapes(scrape_time)
+    assert len(scrapes) == 1
+    scrape = scrapes[0]
+    assert scrape.normal_curve[curve.slot(1, 5)] == 10
+    assert scrape.normal_curve[curve.slot(0, 5)] is None
+    assert (scrape.current_day, scrape.current_hour, scrape.popularity_percent_current) == (1, 12, 70)
+
+def test_save_round_reuses_existing_place():
+    first, second = datetime(2024, 1, 3, 12, 0), datetime(2024, 1, 3, 13, 0)
+    url = URL + "+Again"
+    storage.save_round(make_results([1], url=url), first)
+    storage.save_round(make_results([1], url=url), second)
+    assert query_scrapes(first)[0].place_id == query_scrapes(second)[0].place_id
+
+def test_save_round_rolls_back_on_error():
+    scrape_time = datetime(2024, 1, 2, 12, 0)
+    url = URL + "+Rollback"
+    with patch.object(storage, "bulk_insert_scrapes", side_effect=RuntimeError("db down")):
+        assert not storage.save_round(make_results(range(3), url=url), scrape_time)
+    db = SessionLocal()
+    try:
+        assert db.query(models.Place).filter(models.Place.url == url).count() == 0
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("values", [[None] * curve.SLOTS, list(range(curve.SLOTS)), [0, 254, None] * 56])
+def test_curve_pack_round_trip(values):
+    packed = curve.pack(values)
+    assert len(packed) == curve.SLOTS
+    assert curve.unpack(packed) == [None if v is None else min(v, 254) for v in values]
+
+def test_latest_reading_tracks_newest_scrape():
+    url = URL + "+Latest"
+    storage.save_round(make_results(range(24), url=url, current_hour=12), datetime(2024, 2, 1, 12, 0))
+    # An older scrape written late must not replace the newer reading.
+    storage.save_round(make_results(range(24), url=url, current_hour=9), datetime(2024, 1, 31, 9, 0))
+    db = SessionLocal()
+    try:
+        reading = db.query(models.LatestReading).join(models.Place).filter(models.Place.url == url).one()
+        assert reading.scrape_time == datetime(2024, 2, 1, 12, 0)
+        assert (reading.current_hour, reading.popularity_percent_current, reading.popularity_percent_normal) == (12, 70, 24)
+    finally:
+        db.close()
+
+def test_migrate_legacy_merges_rows_of_one_scrape():
+    url = URL + "+Legacy"
+    legacy = Table(
+        "scrape_data", MetaData(),
+        Column("id", Integer, primary_key=True), Column("place", String), Column("url", String),
+        Column("scrape_time", DateTime), Column("day_of_week", String), Column("hour_of_day", Integer),
+        Column("popularity_percent_normal", Float), Column("popularity_percent_current", Float),
+    )
+    legacy.create(engine)
+    try:
+        rows = []
+        for start in (datetime(2023, 6, 5, 12, 0), datetime(2023, 6, 5, 13, 0)):
+            # the old scraper called datetime.now() for every hour row
+            for i, (day, hour) in enumerate(itertools.product(curve.DAYS, range(24))):
+                rows.append({
+                    "place": "Legacy Pizza", "url": url,
+                    "scrape_time": start + timedelta(microseconds=250 * i),
+                    "day_of_week": day, "hour_of_day": hour,
+                    "popularity_percent_normal": hour, "popularity_percent_current": None,
+                })
+        with engine.begin() as conn:
+            conn.execute(legacy.insert(), rows)
+
+        assert storage.migrate_legacy_scrape_data() == 2
+        with SessionLocal() as db:
+            scrapes = db.query(models.Scrape).join(models.Place).filter(models.Place.url == url).all()
+        assert sorted(s.scrape_time for s in scrapes) == [datetime(2023, 6, 5, 12, 0), datetime(2023, 6, 5, 13, 0)]
+        assert all(s.normal_curve[curve.slot(3, 7)] == 7 for s in scrapes)
+    finally:
+        legacy.drop(engine)
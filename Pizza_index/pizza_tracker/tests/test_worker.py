@@ -0,0 +1,103 @@
+# pizza_tracker/tests/test_worker.py
+
+import threading
+import urllib.request
+from datetime import datetime
+from unittest.mock import patch
+from src import config, jobs, models, scheduler, worker
+from src.database import SessionLocal
+
+BASE = "https://www.google.com/maps/search/?api=1&query=Worker+Pizza+"
+
+def data_for(url):
+    return [{"day_of_week": "Monday", "hour_of_day": 12, "popularity_percent_normal": 50, "popularity_percent_current": 70}]
+
+def test_make_jobs_splits_a_round_under_one_scrape_time():
+    now = datetime(2024, 5, 6, 12, 0)
+    payloads = jobs.make_jobs(["a", "b", "c"], now, batch_size=2)
+    assert [p["urls"] for p in payloads] == [["a", "b"], ["c"]]
+    assert {p["scrape_time"] for p in payloads} == {now.isoformat()}
+
+def test_a_job_is_claimed_once_and_released_until_it_fails():
+    queue = jobs.SqlQueue()
+    queue.put(jobs.make_jobs([BASE + "Claim"], datetime.now()))
+    assert queue.in_flight() == {BASE + "Claim"}
+
+    job = queue.get(0)
+    assert job[1]["urls"] == [BASE + "Claim"]
+    assert queue.get(0) is None
+
+    for attempt in range(1, config.RETRY_MAX_ATTEMPTS):
+        queue.release(job)
+        job = queue.get(0)
+        assert job is not None
+    queue.release(job)
+    assert queue.get(0) is None
+    assert queue.in_flight() == set()
+    with SessionLocal() as db:
+        assert db.get(models.ScrapeJob, job[0]).status == "failed"
+
+def test_jobs_of_dead_workers_are_requeued_then_failed():
+    queue = jobs.SqlQueue()
+    queue.put(jobs.make_jobs([BASE + "Dead"], datetime.now()))
+    for attempt in range(config.RETRY_MAX_ATTEMPTS):
+        job = queue.get(0)
+        assert job is not None
+        # the worker dies without finishing or releasing the job
+        with SessionLocal() as db:
+            db.get(models.ScrapeJob, job[0]).lease_until = datetime(2000, 1, 1)
+            db.commit()
+        queue.requeue_expired()
+
+    with SessionLocal() as db:
+        assert db.get(models.ScrapeJob, job[0]).status == "failed"
+    assert BASE + "Dead" not in queue.in_flight()
+    assert queue.get(0) is None
+
+def test_worker_saves_queued_rounds():
+    queue = jobs.SqlQueue()
+    urls = [BASE + "A", BASE + "B", BASE + "C"]
+    scrape_time = datetime(2024, 5, 6, 12, 0)
+    queue.put(jobs.make_jobs(urls, scrape_time, batch_size=2))
+
+    stop = threading.Event()
+    def fetch(url):
+        if url == urls[-1]:
+            stop.set()
+        return data_for(url)
+
+    with patch("src.scraper.get_popular_times", side_effect=fetch):
+        assert worker.run(queue, stop, poll_seconds=0) == 2
+
+    with SessionLocal() as db:
+        saved = db.query(models.Scrape).join(models.Place).filter(models.Place.url.in_(urls)).all()
+        assert {s.scrape_time for s in saved} == {scrape_time}
+        assert len(saved) == 3
+    assert queue.in_flight() == set()
+
+def test_scheduler_queues_jobs_instead_of_scraping():
+    queue = jobs.SqlQueue()
+    with patch.object(jobs, "get_queue", return_value=queue), \
+            patch.object(scheduler, "scrape_round") as scrape_round:
+        scheduler.dispatch([BASE + "Queued"])
+    scrape_round.assert_not_called()
+    assert BASE + "Queued" in queue.in_flight()
+
+def test_worker_scrapes_show_up_in_its_metrics():
+    queue = jobs.SqlQueue()
+    queue.put(jobs.make_jobs([BASE + "Metered"], datetime.now()))
+    stop = threading.Event()
+    def fetch(url):
+        if url == BASE + "Metered":
+            stop.set()
+        return data_for(url)
+
+    server = worker.serve_metrics(0)
+    try:
+        with patch("src.scraper.get_popular_times", side_effect=fetch):
+            worker.run(queue, stop, poll_seconds=0)
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics").read().decode()
+    finally:
+        server.shutdown()
+    assert 'pizza_scrapes_total{outcome="success",place="Worker+Pizza+Metered"} 1.0' in body
+    assert 'pizza_db_writes_total{outcome="success"}' in body
@@ -2,10 +2,7 @@
 
 // This script will fetch data from the API and update the UI.
 
-async function fetchData() {
-    const response = await fetch('/api/status');
-    const data = await response.json();
-
+function showStatus(data) {
     const statusIndicator = document.getElementById('status-indicator');
     if (data.status === 'abnormal') {
         statusIndicator.textContent = data.message || 'anomaly detected – danger likely';
@@ -16,4 +13,90 @@ async function fetchData() {
     }
 }
 
-fetchData();
+const SVG_NS = 'http://www.w3.org/2000/svg';
+const CHART_WIDTH = 600;
+const CHART_HEIGHT = 150;
+
+// Builds an SVG polyline of one series; null values break the line.
+function polyline(times, values, tMin, tSpan, className) {
+    const group = document.createElementNS(SVG_NS, 'g');
+    let points = [];
+    const flush = () => {
+        if (points.length) {
+            const line = document.createElementNS(SVG_NS, 'polyline');
+            line.setAttribute('points', points.join(' '));
+            line.setAttribute('class', className);
+            group.appendChild(line);
+        }
+        points = [];
+    };
+    values.forEach((v, i) => {
+        if (v === null) {
+            flush();
+            return;
+        }
+        const x = tSpan ? (times[i] - tMin) / tSpan * CHART_WIDTH : 0;
+        const y = CHART_HEIGHT - Math.min(v, 100) / 100 * CHART_HEIGHT;
+        points.push(`${x.toFixed(1)},${y.toFixed(1)}`);
+    });
+    flush();
+    return group;
+}
+
+function renderChart(series) {
+    const figure = document.createElement('figure');
+    const caption = document.createElement('figcaption');
+    caption.textContent = decodeURIComponent(series.place.replace(/\+/g, ' '));
+    figure.appendChild(caption);
+
+    const svg = document.createElementNS(SVG_NS, 'svg');
+    svg.setAttribute('viewBox', `0 0 ${CHART_WIDTH} ${CHART_HEIGHT}`);
+    svg.setAttribute('class', 'chart');
+    const times = series.t.map(t => Date.parse(t));
+    const tMin = Math.min(...times);
+    const tSpan = Math.max(...times) - tMin;
+    svg.appendChild(polyline(times, series.normal, tMin, tSpan, 'normal'));
+    svg.appendChild(polyline(times, series.current, tMin, tSpan, 'current'));
+    figure.appendChild(svg);
+    return figure;
+}
+
+async function fetchCharts() {
+    // The server downsamples, and answers 304 while nothing new was scraped.
+    const points = Math.round(document.getElementById('charts-container').clientWidth || CHART_WIDTH);
+    const response = await fetch(`/api/series?resolution=lttb&points=${points}`);
+    if (!response.ok) {
+        return;
+    }
+    const data = await response.json();
+
+    const container = document.getElementById('charts-container');
+    container.replaceChildren(...data.map(renderChart));
+}
+
+async function fetchData() {
+    const response = await fetch('/api/status');
+    showStatus(await response.json());
+}
+
+// Redraws the charts once per round rather than once per reading.
+let chartTimer = null;
+function scheduleCharts() {
+    clearTimeout(chartTimer);
+    chartTimer = setTimeout(fetchCharts, 1000);
+}
+
+function subscribe() {
+    // The server pushes the status on connect and after every scrape round,
+    // and EventSource reconnects by itself if the connection drops.
+    const source = new EventSource('/api/events');
+    source.addEventListener('status', event => showStatus(JSON.parse(event.data)));
+    source.addEventListener('reading', scheduleCharts);
+}
+
+if (window.EventSource) {
+    subscribe();
+} else {
+    fetchData();
+}
+fetchCharts();
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+'''
+Wait for a google maps page only as long as the place needs
+
+Returns as soon as the popularity bars are rendered, gives up early on a place
+that has no popular times, and learns how long each place usually takes to
+render so a timeout costs its p95 load time instead of a fixed SLEEP_SEC.
+'''
+
+import os
+import json
+import math
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+BAR_CLASS = 'section-popular-times-bar'
+
+# outcomes of waiting for a page
+BARS = 'bars'
+NO_DATA = 'no_data'
+TIMEOUT = 'timeout'
+
+# one round trip per poll: are the bars there, and is the place panel rendered?
+STATE_SCRIPT = '''
+return [
+	document.getElementsByClassName(arguments[0]).length > 0,
+	document.querySelector('[role="main"] h1') !== null,
+];
+'''
+
+POLL_SEC = 0.25
+
+class PageState:
+	'''
+	WebDriverWait condition, met as soon as the bars are in the page, or when
+	the place panel has been there for grace seconds without them (the layout
+	of a place without popular times)
+	'''
+
+	def __init__(self, grace):
+		self.grace = grace
+		self.panel_seen = None
+
+	def __call__(self, d):
+		bars, panel = d.execute_script(STATE_SCRIPT, BAR_CLASS)
+		if bars:
+			return BARS
+		if panel:
+			now = time.monotonic()
+			if self.panel_seen is None:
+				self.panel_seen = now
+			elif now - self.panel_seen >= self.grace:
+				return NO_DATA
+		return False
+
+class LoadTimes:
+	'''
+	Recent load times per place, kept in a json file between runs. The timeout
+	of a place is the p95 of them times margin, between minimum and maximum.
+	'''
+
+	def __init__(self, path, minimum, maximum, margin, min_samples=5, window=50):
+		self.path = path
+		self.minimum = minimum
+		self.maximum = maximum
+		self.margin = margin
+		self.min_samples = min_samples
+		self.window = window
+		try:
+			with open(path, 'r') as f:
+				self.samples = json.load(f)
+		except (OSError, ValueError):
+			self.samples = {}
+
+	def record(self, place, seconds):
+		samples = self.samples.setdefault(place, [])
+		samples.append(round(seconds, 2))
+		del samples[:-self.window]
+
+	def timeout(self, place):
+		samples = sorted(self.samples.get(place, []))
+		if len(samples) < self.min_samples:
+			return self.maximum
+		p95 = samples[math.ceil(0.95 * len(samples)) - 1]
+		return min(max(p95 * self.margin, self.minimum), self.maximum)
+
+	def save(self):
+		with open(self.path + '.tmp', 'w') as f:
+			json.dump(self.samples, f)
+		os.replace(self.path + '.tmp', self.path)
+
+def wait_ready(d, place, load_times, grace):
+	# returns BARS, NO_DATA or TIMEOUT
+	timeout = load_times.timeout(place)
+	started = time.monotonic()
+	try:
+		state = WebDriverWait(d, timeout, poll_frequency=POLL_SEC).until(PageState(grace))
+	except TimeoutException:
+		# the page may just have become slower, widen the timeout a bit
+		load_times.record(place, min(timeout * load_times.margin, load_times.maximum))
+		return TIMEOUT
+	if state == BARS:
+		load_times.record(place, time.monotonic() - started)
+	return state
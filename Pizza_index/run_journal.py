@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+'''
+Journal of scrape runs, so a run that died can be resumed
+
+Every url of a run gets a row with its status, in a small sqlite db. A run
+over the same input that finds a recent unfinished run continues it, under the
+same run time: urls that are done are skipped, failed ones are retried with
+backoff.
+'''
+
+import time
+import sqlite3
+from datetime import datetime
+
+class RunJournal:
+
+	def __init__(self, path, max_attempts, backoff_sec, max_age_sec):
+		self.max_attempts = max_attempts
+		self.backoff_sec = backoff_sec
+		self.max_age_sec = max_age_sec
+		self.run_id = None
+
+		# autocommit, every status change is on disk before the next url starts
+		self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+		self.conn.execute('''CREATE TABLE IF NOT EXISTS runs (
+			run_id TEXT PRIMARY KEY,
+			source TEXT,
+			started_at TEXT,
+			finished_at TEXT
+		)''')
+		# status: started, done, no_data or failed
+		self.conn.execute('''CREATE TABLE IF NOT EXISTS urls (
+			run_id TEXT,
+			url TEXT,
+			status TEXT,
+			attempts INTEGER,
+			next_try REAL,
+			error TEXT,
+			PRIMARY KEY (run_id, url)
+		)''')
+
+	def start(self, source, run_time):
+		# continue the last unfinished run of this source if it started less
+		# than max_age_sec ago, or start run_time
+		# returns the run id, which is the run time of the run
+		now = datetime.now()
+		row = self.conn.execute(
+			'SELECT run_id, started_at FROM runs WHERE source = ? AND finished_at IS NULL ORDER BY started_at DESC LIMIT 1',
+			(source,),
+		).fetchone()
+		if row and (now - datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S')).total_seconds() < self.max_age_sec:
+			self.run_id = row[0]
+			print('RESUMING RUN', self.run_id, source)
+			return self.run_id
+
+		# too old to resume, the urls it missed are in this run anyway
+		self.conn.execute(
+			'UPDATE runs SET finished_at = ? WHERE source = ? AND finished_at IS NULL',
+			(now.strftime('%Y-%m-%d %H:%M:%S'), source),
+		)
+		self.run_id = run_time
+		self.conn.execute(
+			'INSERT INTO runs VALUES (?, ?, ?, NULL)',
+			(run_time, source, now.strftime('%Y-%m-%d %H:%M:%S')),
+		)
+		return self.run_id
+
+	def _get(self, url):
+		return self.conn.execute(
+			'SELECT status, attempts, next_try FROM urls WHERE run_id = ? AND url = ?', (self.run_id, url)
+		).fetchone()
+
+	def finished(self, url):
+		# done, or failed too often to try again
+		row = self._get(url)
+		if row is None:
+			return False
+		status, attempts, _ = row
+		return status in ('done', 'no_data') or (status == 'failed' and attempts >= self.max_attempts)
+
+	def due(self, url):
+		# false while a failed url waits for its retry
+		row = self._get(url)
+		return row is None or row[0] != 'failed' or row[2] <= time.time()
+
+	def started(self, url):
+		# counted as an attempt right away, so a url that crashes the run isn't tried forever
+		self.conn.execute('''INSERT INTO urls VALUES (?, ?, 'started', 1, NULL, NULL)
+			ON CONFLICT (run_id, url) DO UPDATE SET status = 'started', attempts = attempts + 1''',
+			(self.run_id, url))
+
+	def done(self, url, status='done'):
+		self.conn.execute(
+			'UPDATE urls SET status = ?, next_try = NULL, error = NULL WHERE run_id = ? AND url = ?',
+			(status, self.run_id, url),
+		)
+
+	def failed(self, url, error):
+		# wait backoff_sec, then twice as long, ... before the next attempt
+		attempts = self._get(url)[1]
+		self.conn.execute(
+			"UPDATE urls SET status = 'failed', next_try = ?, error = ? WHERE run_id = ? AND url = ?",
+			(time.time() + self.backoff_sec * 2 ** (attempts - 1), error, self.run_id, url),
+		)
+
+	def retryable(self):
+		# failed urls with attempts left, as (url, next_try), soonest first
+		return self.conn.execute(
+			"SELECT url, next_try FROM urls WHERE run_id = ? AND status IN ('failed', 'started') AND attempts < ? ORDER BY next_try",
+			(self.run_id, self.max_attempts),
+		).fetchall()
+
+	def finish(self):
+		self.conn.execute(
+			'UPDATE runs SET finished_at = ? WHERE run_id = ?',
+			(datetime.now().strftime('%Y-%m-%d %H:%M:%S'), self.run_id),
+		)
+		self.conn.close()
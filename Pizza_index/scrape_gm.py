@@ -5,24 +5,30 @@ Run the google maps popularity scraper
 '''
 
 import os
+import re
 import sys
+import html as html_lib
 import time
+import queue
+import threading
 import urllib.parse
 import requests
 import csv
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
 from datetime import datetime
 import pandas as pd
 
 # load local params from config.py
 import config
+from html_cache import HtmlCache
+from html_archive import HtmlArchive
+import readiness
+from url_resolver import UrlResolver
+import url_source
+from run_journal import RunJournal
 
 # gmaps starts their weeks on sunday
 days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
@@ -30,87 +36,118 @@ days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Satur
 # generate unique runtime for this job
 run_time = datetime.now().strftime('%Y%m%d_%H%M%S')
 
-def expand_url(short_url):
-    try:
-        response = requests.head(short_url, allow_redirects=True, timeout=10)
-        return response.url
-    except requests.exceptions.RequestException as e:
-        print(f"Error expanding URL {short_url}: {e}")
-        return None
+# parsed data by page content hash, and the pages themselves
+cache = HtmlCache('html', config.HTML_CACHE_MAX_BYTES)
+archive = HtmlArchive(config.HTML_ARCHIVE_DIR)
 
-def main():
-	# read the list of URLs from a URL, or path to a local txt
-	if not config.DEBUG:
-		if len(sys.argv) > 1:
-			# read path to file from system arguments
-			with open(sys.argv[1], 'r') as f:
-				reader = csv.reader(f)
-				# Skip header if it exists
-				first_line = next(reader)
-				if "url" in first_line[0].lower(): # Check if it's a header
-					pass
-				else:
-					f.seek(0) # Reset file pointer if no header
-				url_list = [row[0].strip() for row in reader if row and row[0].strip()]
-		else:
-			# get path to file from config.py
-			with open(config.URL_PATH_INPUT, 'r') as f:
-				reader = csv.reader(f)
-				# Skip header if it exists
-				first_line = next(reader)
-				if "url" in first_line[0].lower(): # Check if it's a header
-					pass
-				else:
-					f.seek(0) # Reset file pointer if no header
-				url_list = [row[0].strip() for row in reader if row and row[0].strip()]
-	else:
+# how long each place takes to render, to size its timeout
+load_times = readiness.LoadTimes(config.LOAD_TIMES_PATH, config.READY_TIMEOUT_MIN, config.SLEEP_SEC, config.READY_TIMEOUT_MARGIN)
+
+# per-url status of this run and unfinished earlier ones
+journal = RunJournal(config.JOURNAL_PATH, config.RETRY_MAX_ATTEMPTS, config.RETRY_BACKOFF_SEC, config.RUN_INTERVAL_SEC)
+
+# short url -> full url, shared by all runs
+resolver = UrlResolver(config.URL_CACHE_PATH, config.URL_CACHE_TTL_SEC, config.EXPAND_WORKERS)
+
+def input_source():
+	# a csv of URLs: from the system arguments, or the paths in config.py
+	if config.DEBUG:
 		# debugging case
 		print('RUNNING TEST URLS...')
-		with open(config.URL_PATH_INPUT_TEST, 'r') as f:
-			reader = csv.reader(f)
-			# Skip header if it exists
-			first_line = next(reader)
-			if "url" in first_line[0].lower(): # Check if it's a header
-				pass
-			else:
-				f.seek(0) # Reset file pointer if no header
-			url_list = [row[0].strip() for row in reader if row and row[0].strip()]
-	
-	expanded_url_list = []
-	for url in url_list:
-		expanded_url = expand_url(url)
-		if expanded_url:
-			expanded_url_list.append(expanded_url)
-		else:
-			print(f"Skipping URL due to expansion error: {url}")
-
-	for url in expanded_url_list:
-		#print(urllib.parse.urlparse(url))
-		#print (url)
+		return config.URL_PATH_INPUT_TEST
+	if len(sys.argv) > 1:
+		return sys.argv[1]
+	return config.URL_PATH_INPUT
+
+def feed_urls(source, work):
+	# read, de-duplicate and expand the URLs while the main thread scrapes,
+	# the bounded queue keeps this only a little ahead of the scraping
+	try:
+		urls = url_source.unique(url_source.read_urls(source))
+		# different short urls can point to the same place
+		seen = set()
+		for url, expanded_url in resolver.expand_all(urls):
+			if not expanded_url:
+				print(f"Skipping URL due to expansion error: {url}")
+			elif expanded_url not in seen:
+				seen.add(expanded_url)
+				work.put(expanded_url)
+	except Exception as e:
+		print(f'ERROR: reading URLs from {source} - {e}')
+	finally:
+		work.put(None)
+
+def scrape_one(url):
+	# scrape one url and write its csv, recording the outcome in the journal
+	journal.started(url)
+	try:
+		data, state = run_scraper(url)
+	except Exception as e:
+		print(f'ERROR: {url} {run_time} - {e}')
+		journal.failed(url, str(e))
+		return
 
-		try:
-			data = run_scraper(url)
-		except Exception as e:
-			print(f'ERROR: {url} {run_time} - {e}')
-			# go to next url
-			continue
+	if len(data) == 0 and state == readiness.TIMEOUT:
+		# the page didn't render in time, try it again later in the run
+		journal.failed(url, 'timeout')
+		return
+
+	if len(data) > 0:
+		# valid data to be written
+		file_name = make_file_name(url)
 
-		if len(data) > 0:
-			# valid data to be written
-			file_name = make_file_name(url)
+		with open('data' + os.sep + file_name + '.' + run_time + '.csv', 'w') as f:
+			# write header
+			f.write(config.DELIM.join(config.HEADER_COLUMNS)+'\n')
 
-			with open('data' + os.sep + file_name + '.' + run_time + '.csv', 'w') as f:
-				# write header
-				f.write(config.DELIM.join(config.HEADER_COLUMNS)+'\n')
+			# write data
+			for row in data:
+				f.write(config.DELIM.join((file_name,url,run_time)) + config.DELIM + config.DELIM.join([str(x or '') for x in row])+'\n')
 
-				# write data
-				for row in data:
-					f.write(config.DELIM.join((file_name,url,run_time)) + config.DELIM + config.DELIM.join([str(x or '') for x in row])+'\n')
+		journal.done(url)
+		print('DONE:', url, run_time)
 
-			print('DONE:', url, run_time)
+	else:
+		journal.done(url, 'no_data')
+		print('WARNING: no data', url, run_time)
 
-		else:
-			print('WARNING: no data', url, run_time)
+def main():
+	global run_time
+
+	# a run that died is continued under its own run time
+	source = input_source()
+	run_time = journal.start(source, run_time)
+
+	work = queue.Queue(maxsize=config.URL_QUEUE_SIZE)
+	producer = threading.Thread(target=feed_urls, args=(source, work), daemon=True)
+	producer.start()
+
+	for url in iter(work.get, None):
+		if journal.finished(url):
+			print('SKIP: already done', url, run_time)
+		elif journal.due(url):
+			scrape_one(url)
+		# otherwise it failed recently, it is retried below
+
+	# retry failed urls, waiting for the soonest one each time
+	while True:
+		retry = journal.retryable()
+		if not retry:
+			break
+		due = max(time.time(), retry[0][1] or 0)
+		time.sleep(max(0, due - time.time()))
+		for url, next_try in retry:
+			if (next_try or 0) <= due:
+				scrape_one(url)
+	journal.finish()
+
+	producer.join()
+	# short urls expanded in this run are reused by the next ones
+	resolver.save()
+	load_times.save()
+
+	# drop the oldest days of archived pages once the archive gets too big
+	archive.prune(config.HTML_ARCHIVE_MAX_BYTES)
 
 
 def run_scraper(u):
@@ -119,12 +156,21 @@ def run_scraper(u):
 	scrape_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
 	# get html source (note this uses headless Chrome via Selenium)
-	html = get_html(u, 'html' + os.sep + make_file_name(u) + '.' + run_time + '.html')
+	html, state = get_html(u)
 
-	# parse html (uses beautifulsoup4)
-	data = parse_html(html)
+	# keep the page in the compressed archive for this day
+	if config.SAVE_HTML:
+		archive.append(make_file_name(u), run_time, html)
 
-	return data
+	# a page that was already seen is not parsed again
+	key = cache.key(html)
+	data = cache.get_parsed(key)
+	if data is None:
+		data = parse_html(html)
+		cache.put(key, data)
+
+	# the parsed rows, and how waiting for the page ended
+	return data, state
 
 def make_file_name(u):
 	# generate filename from gmaps url
@@ -143,62 +189,90 @@ def make_file_name(u):
 
 	return file_name
 
-def get_html(u,file_name):
-
-	# if the html source exists as a local file, don't bother to scrape it
-	# this shouldn't run
-	if False and os.path.isfile(file_name):
-		with open(file_name,'r') as f:
-			html = f.read()
-		return html
-
-	else:
-		# requires chromedriver
-		options = webdriver.ChromeOptions()
-		#options.add_argument('--start-maximized')
-		# options.add_argument('--headless')
-		# https://stackoverflow.com/a/55152213/2327328
-		# I choose German because the time is 24h, less to parse
-		options.add_argument('--lang=de-DE')
-		options.binary_location = config.CHROME_BINARY_LOCATION
-		chrome_driver_binary = config.CHROMEDRIVER_BINARY_LOCATION
-		d = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install(), options=options))
-
-		# get page
-		d.get(u)
-
-		# sleep to let the page render, it can take some time
-		# timeout after max N seconds (config.py)
-		# based on https://stackoverflow.com/questions/26566799/wait-until-page-is-loaded-with-selenium-webdriver-for-python
+def get_html(u):
+
+	# requires chromedriver
+	options = webdriver.ChromeOptions()
+	#options.add_argument('--start-maximized')
+	# options.add_argument('--headless')
+	# https://stackoverflow.com/a/55152213/2327328
+	# I choose German because the time is 24h, less to parse
+	options.add_argument('--lang=de-DE')
+	options.binary_location = config.CHROME_BINARY_LOCATION
+	chrome_driver_binary = config.CHROMEDRIVER_BINARY_LOCATION
+	if config.BROWSER_PROFILE == 'light':
+		# only what is needed to render the labels
+		for arg in ('--disable-gpu', '--disable-extensions', '--disable-dev-shm-usage',
+				'--disable-background-networking', '--mute-audio', '--blink-settings=imagesEnabled=false',
+				'--js-flags=--max-old-space-size=%d' % config.BROWSER_MAX_HEAP_MB):
+			options.add_argument(arg)
+	d = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+
+	if config.BROWSER_PROFILE == 'light':
+		# drop images, map tiles, fonts and media before they are downloaded
 		try:
-			WebDriverWait(d, config.SLEEP_SEC).until(EC.presence_of_element_located((By.CLASS_NAME, 'section-popular-times-bar')))
-		except TimeoutException:
-			print('ERROR: Timeout! (This could be due to missing "popular times" data, or not enough waiting.)',u)
-
-		# save html local file
-		if config.SAVE_HTML:
-			with open(file_name, 'w') as f:
-				f.write(d.page_source)
-
-		# save html as variable
-		html = d.page_source
-
-		d.quit()
-		return html
+			d.execute_cdp_cmd('Network.enable', {})
+			d.execute_cdp_cmd('Network.setBlockedURLs', {'urls': config.BLOCKED_URLS})
+		except Exception as e:
+			print('WARNING: could not block resources', e)
+
+	# get page
+	d.get(u)
+
+	# let the page render, it can take some time
+	# the timeout is learned per place, up to SLEEP_SEC
+	state = readiness.wait_ready(d, make_file_name(u), load_times, config.READY_NO_DATA_GRACE)
+	if state == readiness.NO_DATA:
+		print('WARNING: no "popular times" on the page', u)
+	elif state == readiness.TIMEOUT:
+		print('ERROR: Timeout! (This could be due to missing "popular times" data, or not enough waiting.)',u)
+
+	# save html as variable
+	html = d.page_source
+
+	d.quit()
+	return html, state
+
+BAR_CLASS = 'section-popular-times-bar'
+# a <div> start tag, quoted attribute values may contain '>'
+DIV_TAG_RE = re.compile(r'''<div\b((?:[^>"']|"[^"]*"|'[^']*')*)>''', re.IGNORECASE)
+# newer labels, e.g. "Normalerweise 20 % Betrieb um 10 Uhr"
+USUAL_LABEL_RE = re.compile(r'Normalerweise (\d+)\s*% Betrieb um (\d+) Uhr')
+ATTR_RE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+def bar_labels(html):
+	# find the aria-labels of the popularity bars without building a DOM:
+	# look for the class name, then tokenize only the tag around it
+	if config.PARSER_BACKEND == 'bs4':
+		soup = BeautifulSoup(html,features='html.parser')
+		return [pop['aria-label'] for pop in soup.find_all('div', {'class': BAR_CLASS}) if pop.has_attr('aria-label')]
+
+	labels = []
+	pos = html.find(BAR_CLASS)
+	while pos != -1:
+		start = html.rfind('<', 0, pos)
+		m = DIV_TAG_RE.match(html, start) if start != -1 else None
+		if m is None or m.end() <= pos:
+			# the class name outside of a div tag, e.g. in css or a script
+			pos = html.find(BAR_CLASS, pos + len(BAR_CLASS))
+			continue
+		attrs = {}
+		for a in ATTR_RE.finditer(m.group(1)):
+			value = next((v for v in a.group(2, 3, 4) if v is not None), '')
+			attrs[a.group(1).lower()] = html_lib.unescape(value)
+		if BAR_CLASS in attrs.get('class', '').split() and 'aria-label' in attrs:
+			labels.append(attrs['aria-label'])
+		pos = html.find(BAR_CLASS, m.end())
+	return labels
 
 def parse_html(html):
 
-	soup = BeautifulSoup(html,features='html.parser')
-
-	pops = soup.find_all('div', {'class': 'section-popular-times-bar'})
-
 	hour = 0
 	dow = 0
 	data = []
 
-	for pop in pops:
+	for t in bar_labels(html):
 		# note that data is stored sunday first, regardless of the local
-		t = pop['aria-label']
 		# debugging
 		#print(t)
 
@@ -206,7 +280,12 @@ def parse_html(html):
 		freq_now = None
 
 		try:
-			if 'normal' not in t:
+			usual = USUAL_LABEL_RE.search(t)
+			if usual:
+				# newer labels put the percentage first
+				freq = int(usual.group(1))
+				hour = int(usual.group(2))
+			elif 'normal' not in t:
 				hour = int(t.split()[1])
 				freq = int(t.split()[4]) # gm uses int
 			else:
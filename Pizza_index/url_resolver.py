@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+'''
+Expand short google maps urls (goo.gl etc.) concurrently, with a cache file
+'''
+
+import os
+import re
+import json
+import time
+import threading
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# google on any country domain, e.g. google.com, www.google.de, maps.google.co.uk
+# (consent.google.* and other subdomains don't match)
+GOOGLE_HOST_RE = re.compile(r'^(www\.|maps\.)?google\.(com|[a-z]{2}|com?\.[a-z]{2})$')
+
+class UrlResolver:
+	'''
+	Follows the redirects of short urls with a pool of threads sharing one
+	requests session, so connections to goo.gl are reused.
+
+	Resolved urls are kept in a json file, short url -> [full url, unix time],
+	and reused for ttl_sec, so repeated runs don't touch the network for them.
+	Failures, including responses that don't end on a google maps url, are
+	not cached.
+	'''
+
+	def __init__(self, cache_path, ttl_sec, workers=16, timeout=10):
+		self.cache_path = cache_path
+		self.ttl_sec = ttl_sec
+		self.workers = workers
+		self.timeout = timeout
+		self.lock = threading.Lock()
+
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+
+		try:
+			with open(cache_path, 'r') as f:
+				self.cache = json.load(f)
+		except (OSError, ValueError):
+			self.cache = {}
+
+	@staticmethod
+	def is_full(url):
+		# a google maps url, nothing to expand: google.<tld>/maps/..., or
+		# anything on maps.google.<tld> (e.g. /?cid=...) but a "sorry" page
+		parts = urllib.parse.urlsplit(url)
+		m = GOOGLE_HOST_RE.match(parts.netloc.lower())
+		if m is None or parts.path.startswith('/sorry'):
+			return False
+		return m.group(1) == 'maps.' or parts.path.startswith('/maps')
+
+	def expand(self, url):
+		# returns the full url, or None if it could not be expanded
+		if self.is_full(url):
+			return url
+
+		with self.lock:
+			cached = self.cache.get(url)
+		if cached and time.time() - cached[1] < self.ttl_sec:
+			return cached[0]
+
+		try:
+			response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+		except requests.exceptions.RequestException as e:
+			print(f"Error expanding URL {url}: {e}")
+			return None
+
+		# an error, or a redirect to a consent or "sorry" page, is not an expansion
+		if not response.ok or not self.is_full(response.url):
+			print(f"Could not expand URL {url}: {response.status_code} {response.url}")
+			return None
+
+		with self.lock:
+			self.cache[url] = [response.url, time.time()]
+		return response.url
+
+	def expand_all(self, urls):
+		# yields (url, full url or None) in input order, reading urls lazily
+		# and keeping at most 2 * workers lookups in flight
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			pending = deque()
+			for url in urls:
+				pending.append((url, pool.submit(self.expand, url)))
+				if len(pending) >= 2 * self.workers:
+					url, future = pending.popleft()
+					yield url, future.result()
+			while pending:
+				url, future = pending.popleft()
+				yield url, future.result()
+
+	def save(self):
+		# drop expired entries and write the cache atomically
+		now = time.time()
+		with self.lock:
+			self.cache = {k: v for k, v in self.cache.items() if now - v[1] < self.ttl_sec}
+			with open(self.cache_path + '.tmp', 'w') as f:
+				json.dump(self.cache, f)
+		os.replace(self.cache_path + '.tmp', self.cache_path)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+'''
+Stream google maps urls from a csv: a local file, any http csv, or a google sheet
+'''
+
+import re
+import csv
+import requests
+
+# a sheet opened in the browser, e.g. https://docs.google.com/spreadsheets/d/<id>/edit#gid=0
+SHEET_RE = re.compile(r'https://docs\.google\.com/spreadsheets/d/([\w-]+)/(?:edit|view)[^#]*(?:#gid=(\d+))?')
+
+def sheet_csv_url(source):
+	# the csv export of a sheet url, other urls are returned as they are
+	m = SHEET_RE.match(source)
+	if m is None:
+		return source
+	return 'https://docs.google.com/spreadsheets/d/%s/export?format=csv&gid=%s' % (m.group(1), m.group(2) or '0')
+
+def read_lines(source):
+	# yield the lines of the csv one by one, without reading it all first
+	if source.startswith('http://') or source.startswith('https://'):
+		with requests.get(sheet_csv_url(source), stream=True, timeout=30) as response:
+			response.raise_for_status()
+			response.encoding = response.encoding or 'utf-8'
+			for line in response.iter_lines(decode_unicode=True):
+				yield line
+	else:
+		with open(source, 'r', newline='') as f:
+			for line in f:
+				yield line
+
+def read_urls(source):
+	# the first column of each row, skipping a header and empty cells
+	reader = csv.reader(read_lines(source))
+	for i, row in enumerate(reader):
+		if not row or not row[0].strip():
+			continue
+		if i == 0 and 'url' in row[0].lower():
+			# header
+			continue
+		yield row[0].strip()
+
+def unique(urls):
+	# drop repeated urls as they come, keeping the first one
+	seen = set()
+	for url in urls:
+		if url not in seen:
+			seen.add(url)
+			yield url